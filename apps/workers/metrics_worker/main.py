@@ -4,66 +4,174 @@ Metrics Worker - Pull GA4/GSC data nightly and store in analytics
 """
 
 import asyncio
-import json
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import numpy as np
+import asyncpg
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
 from google.analytics.data_v1beta.types import (
     RunReportRequest, DateRange, Metric, Dimension, Filter, FilterExpression
 )
 from google.oauth2 import service_account
-import requests
-from urllib.parse import urlencode
+from google.auth.transport.requests import Request as GoogleAuthRequest
+import httpx
+from urllib.parse import urlencode, urlsplit
+from functools import lru_cache
 import time
 
-@dataclass
-class GA4Metrics:
-    page_views: int
-    unique_page_views: int
-    sessions: int
-    users: int
-    bounce_rate: float
-    avg_session_duration: float
-    page_views_per_session: float
-    date: str
-    page_path: str
-    source: str
-    medium: str
-    campaign: str
-
-@dataclass
-class GSCMetrics:
-    clicks: int
-    impressions: int
-    ctr: float
-    position: float
-    date: str
-    query: str
-    page: str
-    country: str
-    device: str
-
-@dataclass
-class AnalyticsData:
-    post_id: str
-    platform: str
-    date: str
-    page_views: int
-    unique_visitors: int
-    sessions: int
-    bounce_rate: float
-    avg_time_on_page: float
-    clicks: int
-    impressions: int
-    ctr: float
-    position: float
-    organic_traffic: int
-    social_traffic: int
-    direct_traffic: int
-    referral_traffic: int
+# Configure logging: records go through a queue to a background thread so
+# writing them never blocks the event loop. Per-post detail is DEBUG level.
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+log_listener = QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logger = logging.getLogger(__name__)
+logger.addHandler(QueueHandler(log_queue))
+logger.setLevel(os.getenv('LOG_LEVEL', 'info').upper())
+logger.propagate = False
+
+@lru_cache(maxsize=4096)
+def url_to_path(url: str) -> str:
+    """Extract the GA4 pagePath (leading '/', no query or fragment) from a URL"""
+    return urlsplit(url).path or '/'
+
+# Traffic source buckets, stored per GA4 row as int8 codes
+TRAFFIC_ORGANIC, TRAFFIC_SOCIAL, TRAFFIC_DIRECT, TRAFFIC_REFERRAL = range(4)
+TRAFFIC_COLUMNS = ('organic_traffic', 'social_traffic', 'direct_traffic', 'referral_traffic')
+
+def classify_traffic(medium: str, source: str) -> int:
+    """Map a GA4 medium/source pair to a traffic bucket code"""
+    if medium == 'organic':
+        return TRAFFIC_ORGANIC
+    if medium == 'social':
+        return TRAFFIC_SOCIAL
+    if medium == '(none)' and source == '(direct)':
+        return TRAFFIC_DIRECT
+    return TRAFFIC_REFERRAL
+
+# GA4 metrics requested for the per-day totals report, in column order
+GA4_TOTAL_METRICS = [
+    'screenPageViews', 'uniquePageviews', 'sessions', 'totalUsers',
+    'bounceRate', 'averageSessionDuration', 'screenPageViewsPerSession'
+]
+
+def ga4_date(value: str) -> str:
+    """Convert a GA4 YYYYMMDD date dimension to ISO format"""
+    return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+
+def ga4_columns(n: int) -> Dict[str, np.ndarray]:
+    """Preallocate struct-of-arrays storage for n GA4 totals report rows"""
+    return {
+        'date': np.empty(n, dtype='datetime64[D]'),
+        'page_views': np.empty(n, dtype=np.int64),
+        'unique_page_views': np.empty(n, dtype=np.int64),
+        'sessions': np.empty(n, dtype=np.int64),
+        'users': np.empty(n, dtype=np.int64),
+        'bounce_rate': np.empty(n, dtype=np.float64),
+        'avg_session_duration': np.empty(n, dtype=np.float64),
+        'page_views_per_session': np.empty(n, dtype=np.float64),
+    }
+
+def ga4_traffic_columns(n: int) -> Dict[str, np.ndarray]:
+    """Preallocate struct-of-arrays storage for n GA4 traffic source report rows"""
+    return {
+        'date': np.empty(n, dtype='datetime64[D]'),
+        'page_views': np.empty(n, dtype=np.int64),
+        'traffic_source': np.empty(n, dtype=np.int8),
+    }
+
+def gsc_columns(n: int) -> Dict[str, np.ndarray]:
+    """Preallocate struct-of-arrays storage for n GSC rows"""
+    return {
+        'date': np.empty(n, dtype='datetime64[D]'),
+        'clicks': np.empty(n, dtype=np.int64),
+        'impressions': np.empty(n, dtype=np.int64),
+        'ctr': np.empty(n, dtype=np.float64),
+        'position': np.empty(n, dtype=np.float64),
+    }
+
+# Raw report rows are COPYed into these per-transaction staging tables, as
+# (table, columns, DDL), and aggregated per date by ANALYTICS_UPSERT_SQL
+STAGING_TABLES = [
+    ('_stage_ga4', ('date', 'page_views', 'unique_page_views', 'sessions', 'bounce_rate', 'avg_session_duration'),
+     'date DATE, page_views INTEGER, unique_page_views INTEGER, sessions INTEGER, bounce_rate REAL, avg_session_duration REAL'),
+    ('_stage_traffic', ('date', 'page_views', 'traffic_source'),
+     'date DATE, page_views INTEGER, traffic_source SMALLINT'),
+    ('_stage_gsc', ('date', 'clicks', 'impressions', 'ctr', 'position'),
+     'date DATE, clicks INTEGER, impressions INTEGER, ctr REAL, position REAL'),
+]
+
+ANALYTICS_UPSERT_SQL = """
+    WITH ga AS (
+        SELECT date,
+               SUM(page_views) AS page_views,
+               SUM(unique_page_views) AS unique_visitors,
+               SUM(sessions) AS sessions,
+               AVG(bounce_rate) AS bounce_rate,
+               AVG(avg_session_duration) AS avg_time_on_page
+        FROM _stage_ga4
+        GROUP BY date
+    ), traffic AS (
+        SELECT date,
+               {traffic_sums}
+        FROM _stage_traffic
+        GROUP BY date
+    ), gsc AS (
+        SELECT date,
+               SUM(clicks) AS clicks,
+               SUM(impressions) AS impressions,
+               AVG(ctr) AS ctr,
+               AVG(position) AS position
+        FROM _stage_gsc
+        GROUP BY date
+    ), dates AS (
+        SELECT date FROM ga UNION SELECT date FROM traffic UNION SELECT date FROM gsc
+    )
+    INSERT INTO analytics (
+        post_id, platform, date, page_views, unique_visitors, sessions,
+        bounce_rate, avg_time_on_page, clicks, impressions, ctr, position,
+        organic_traffic, social_traffic, direct_traffic, referral_traffic
+    )
+    SELECT $1, 'web', dates.date,
+           COALESCE(ga.page_views, 0), COALESCE(ga.unique_visitors, 0), COALESCE(ga.sessions, 0),
+           COALESCE(ga.bounce_rate, 0), COALESCE(ga.avg_time_on_page, 0),
+           COALESCE(gsc.clicks, 0), COALESCE(gsc.impressions, 0),
+           COALESCE(gsc.ctr, 0), COALESCE(gsc.position, 0),
+           COALESCE(traffic.organic_traffic, 0), COALESCE(traffic.social_traffic, 0),
+           COALESCE(traffic.direct_traffic, 0), COALESCE(traffic.referral_traffic, 0)
+    FROM dates
+    LEFT JOIN ga USING (date)
+    LEFT JOIN traffic USING (date)
+    LEFT JOIN gsc USING (date)
+    ON CONFLICT (post_id, platform, date) 
+    DO UPDATE SET 
+        page_views = EXCLUDED.page_views,
+        unique_visitors = EXCLUDED.unique_visitors,
+        sessions = EXCLUDED.sessions,
+        bounce_rate = EXCLUDED.bounce_rate,
+        avg_time_on_page = EXCLUDED.avg_time_on_page,
+        clicks = EXCLUDED.clicks,
+        impressions = EXCLUDED.impressions,
+        ctr = EXCLUDED.ctr,
+        position = EXCLUDED.position,
+        organic_traffic = EXCLUDED.organic_traffic,
+        social_traffic = EXCLUDED.social_traffic,
+        direct_traffic = EXCLUDED.direct_traffic,
+        referral_traffic = EXCLUDED.referral_traffic,
+        updated_at = NOW()
+""".format(traffic_sums=',\n               '.join(
+    f"SUM(page_views) FILTER (WHERE traffic_source = {code}) AS {name}"
+    for code, name in enumerate(TRAFFIC_COLUMNS)
+))
 
 class MetricsWorker:
     def __init__(self):
@@ -91,23 +199,51 @@ class MetricsWorker:
             'end_date': datetime.now().strftime('%Y-%m-%d')
         }
 
-    async def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_config)
+        # Shared HTTP/2 client for GSC calls and database pool, created on first use
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._db_pool: Optional[asyncpg.Pool] = None
+
+        # GSC service account credentials, loaded once; the access token is
+        # reused until it is close to expiry
+        self._gsc_credentials: Optional[service_account.Credentials] = None
+        self._gsc_token_lock = asyncio.Lock()
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """Get the shared HTTP/2 client used for Search Console requests"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                http2=True,
+                timeout=30,
+                headers={'Accept-Encoding': 'gzip'}
+            )
+        return self._http_client
+
+    async def close(self):
+        """Close the shared HTTP client and database pool"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._db_pool is not None:
+            await self._db_pool.close()
+            self._db_pool = None
+
+    async def get_db_pool(self) -> asyncpg.Pool:
+        """Get the shared database connection pool"""
+        if self._db_pool is None:
+            self._db_pool = await asyncpg.create_pool(**self.db_config)
+        return self._db_pool
 
     async def get_published_posts(self) -> List[Dict[str, Any]]:
         """Get all published posts with their URLs"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                await cur.execute("""
-                    SELECT p.id, p.title, p.slug, p.target_keyword, pub.url, pub.platform
-                    FROM posts p
-                    JOIN publishes pub ON p.id = pub.post_id
-                    WHERE pub.status = 'published'
-                    AND pub.url IS NOT NULL
-                """)
-                posts = await cur.fetchall()
-                return [dict(post) for post in posts]
+        pool = await self.get_db_pool()
+        posts = await pool.fetch("""
+            SELECT p.id, p.title, p.slug, p.target_keyword, pub.url, pub.platform
+            FROM posts p
+            JOIN publishes pub ON p.id = pub.post_id
+            WHERE pub.status = 'published'
+            AND pub.url IS NOT NULL
+        """)
+        return [dict(post) for post in posts]
 
     def get_ga4_client(self) -> BetaAnalyticsDataClient:
         """Initialize GA4 client with service account credentials"""
@@ -118,86 +254,101 @@ class MetricsWorker:
             )
             return BetaAnalyticsDataClient(credentials=credentials)
         except Exception as e:
-            print(f"Failed to initialize GA4 client: {e}")
+            logger.error(f"Failed to initialize GA4 client: {e}")
             return None
 
-    async def fetch_ga4_page_metrics(self, page_path: str) -> List[GA4Metrics]:
-        """Fetch GA4 metrics for a specific page"""
+    def build_ga4_request(self, page_path: str, dimensions: List[str], metrics: List[str]) -> RunReportRequest:
+        """Build a GA4 report request filtered to a single page"""
+        return RunReportRequest(
+            property=f"properties/{self.ga4_config['property_id']}",
+            date_ranges=[
+                DateRange(
+                    start_date=self.ga4_config['start_date'],
+                    end_date=self.ga4_config['end_date']
+                )
+            ],
+            dimensions=[Dimension(name=name) for name in dimensions],
+            metrics=[Metric(name=name) for name in metrics],
+            dimension_filter=FilterExpression(
+                filter=Filter(
+                    field_name="pagePath",
+                    string_filter=Filter.StringFilter(value=page_path)
+                )
+            )
+        )
+
+    async def fetch_ga4_page_metrics(self, page_path: str) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """Fetch GA4 per-day totals and traffic source page views for a specific page
+
+        The two reports are requested in parallel: totals only need the date
+        dimension, while the source/medium split only needs page views, which
+        keeps the row count of each response small.
+        """
         client = self.get_ga4_client()
         if not client:
-            return []
+            return ga4_columns(0), ga4_traffic_columns(0)
 
         try:
-            request = RunReportRequest(
-                property=f"properties/{self.ga4_config['property_id']}",
-                date_ranges=[
-                    DateRange(
-                        start_date=self.ga4_config['start_date'],
-                        end_date=self.ga4_config['end_date']
-                    )
-                ],
-                dimensions=[
-                    Dimension(name="date"),
-                    Dimension(name="pagePath"),
-                    Dimension(name="source"),
-                    Dimension(name="medium"),
-                    Dimension(name="campaignName")
-                ],
-                metrics=[
-                    Metric(name="screenPageViews"),
-                    Metric(name="uniquePageviews"),
-                    Metric(name="sessions"),
-                    Metric(name="totalUsers"),
-                    Metric(name="bounceRate"),
-                    Metric(name="averageSessionDuration"),
-                    Metric(name="screenPageViewsPerSession")
-                ],
-                dimension_filter=FilterExpression(
-                    filter=Filter(
-                        field_name="pagePath",
-                        string_filter=Filter.StringFilter(value=page_path)
-                    )
+            totals_response, traffic_response = await asyncio.gather(
+                asyncio.to_thread(
+                    client.run_report,
+                    self.build_ga4_request(page_path, ['date', 'pagePath'], GA4_TOTAL_METRICS)
+                ),
+                asyncio.to_thread(
+                    client.run_report,
+                    self.build_ga4_request(page_path, ['date', 'pagePath', 'medium', 'source'], ['screenPageViews'])
                 )
             )
 
-            response = client.run_report(request)
-            metrics_list = []
-
-            for row in response.rows:
-                metrics = GA4Metrics(
-                    page_views=int(row.metric_values[0].value),
-                    unique_page_views=int(row.metric_values[1].value),
-                    sessions=int(row.metric_values[2].value),
-                    users=int(row.metric_values[3].value),
-                    bounce_rate=float(row.metric_values[4].value),
-                    avg_session_duration=float(row.metric_values[5].value),
-                    page_views_per_session=float(row.metric_values[6].value),
-                    date=row.dimension_values[0].value,
-                    page_path=row.dimension_values[1].value,
-                    source=row.dimension_values[2].value,
-                    medium=row.dimension_values[3].value,
-                    campaign=row.dimension_values[4].value
+            rows = totals_response.rows
+            totals = ga4_columns(len(rows))
+            for i, row in enumerate(rows):
+                metric_values = row.metric_values
+                totals['date'][i] = ga4_date(row.dimension_values[0].value)
+                totals['page_views'][i] = int(metric_values[0].value)
+                totals['unique_page_views'][i] = int(metric_values[1].value)
+                totals['sessions'][i] = int(metric_values[2].value)
+                totals['users'][i] = int(metric_values[3].value)
+                totals['bounce_rate'][i] = float(metric_values[4].value)
+                totals['avg_session_duration'][i] = float(metric_values[5].value)
+                totals['page_views_per_session'][i] = float(metric_values[6].value)
+
+            rows = traffic_response.rows
+            traffic = ga4_traffic_columns(len(rows))
+            for i, row in enumerate(rows):
+                dimension_values = row.dimension_values
+                traffic['date'][i] = ga4_date(dimension_values[0].value)
+                traffic['page_views'][i] = int(row.metric_values[0].value)
+                traffic['traffic_source'][i] = classify_traffic(
+                    dimension_values[2].value, dimension_values[3].value
                 )
-                metrics_list.append(metrics)
 
-            return metrics_list
+            return totals, traffic
 
         except Exception as e:
-            print(f"Error fetching GA4 metrics for {page_path}: {e}")
-            return []
+            logger.error(f"Error fetching GA4 metrics for {page_path}: {e}")
+            return ga4_columns(0), ga4_traffic_columns(0)
+
+    async def get_gsc_access_token(self) -> str:
+        """Get a GSC access token, refreshing it only when it expires within 5 minutes"""
+        async with self._gsc_token_lock:
+            if self._gsc_credentials is None:
+                self._gsc_credentials = service_account.Credentials.from_service_account_file(
+                    self.gsc_config['credentials_file'],
+                    scopes=['https://www.googleapis.com/auth/webmasters.readonly']
+                )
 
-    async def fetch_gsc_page_metrics(self, page_url: str) -> List[GSCMetrics]:
-        """Fetch GSC metrics for a specific page"""
+            credentials = self._gsc_credentials
+            # google-auth reports expiry as a naive UTC datetime
+            if not credentials.token or credentials.expiry - datetime.utcnow() < timedelta(minutes=5):
+                await asyncio.to_thread(credentials.refresh, GoogleAuthRequest())
+            return credentials.token
+
+    async def fetch_gsc_page_metrics(self, page_url: str) -> Dict[str, np.ndarray]:
+        """Fetch GSC metrics for a specific page as columnar arrays"""
         try:
             # Get access token
-            credentials = service_account.Credentials.from_service_account_file(
-                self.gsc_config['credentials_file'],
-                scopes=['https://www.googleapis.com/auth/webmasters.readonly']
-            )
-            
-            # Refresh token
-            credentials.refresh(requests.Request())
-            access_token = credentials.token
+            access_token = await self.get_gsc_access_token()
 
             # GSC API endpoint
             url = "https://searchconsole.googleapis.com/v1/sites/{}/searchAnalytics/query".format(
@@ -224,212 +375,75 @@ class MetricsWorker:
                 ]
             }
 
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
+            response = await self.get_http_client().post(url, headers=headers, json=payload)
             
             if response.status_code == 200:
-                data = response.json()
-                metrics_list = []
-
-                for row in data.get('rows', []):
-                    metrics = GSCMetrics(
-                        clicks=row['clicks'],
-                        impressions=row['impressions'],
-                        ctr=row['ctr'],
-                        position=row['position'],
-                        date=row['keys'][0],
-                        query=row['keys'][1],
-                        page=row['keys'][2],
-                        country=row['keys'][3],
-                        device=row['keys'][4]
-                    )
-                    metrics_list.append(metrics)
-
-                return metrics_list
+                data = orjson.loads(response.content)
+                rows = data.get('rows', [])
+                columns = gsc_columns(len(rows))
+
+                for i, row in enumerate(rows):
+                    columns['date'][i] = row['keys'][0]
+                    columns['clicks'][i] = row['clicks']
+                    columns['impressions'][i] = row['impressions']
+                    columns['ctr'][i] = row['ctr']
+                    columns['position'][i] = row['position']
+
+                return columns
             else:
-                print(f"GSC API error: {response.status_code} - {response.text}")
-                return []
+                logger.error(f"GSC API error: {response.status_code} - {response.text}")
+                return gsc_columns(0)
 
         except Exception as e:
-            print(f"Error fetching GSC metrics for {page_url}: {e}")
-            return []
-
-    async def aggregate_metrics(self, post_id: str, ga4_metrics: List[GA4Metrics], gsc_metrics: List[GSCMetrics]) -> List[AnalyticsData]:
-        """Aggregate metrics by date for a post"""
-        # Group GA4 metrics by date
-        ga4_by_date = {}
-        for metric in ga4_metrics:
-            date = metric.date
-            if date not in ga4_by_date:
-                ga4_by_date[date] = {
-                    'page_views': 0,
-                    'unique_visitors': 0,
-                    'sessions': 0,
-                    'bounce_rate': 0,
-                    'avg_time_on_page': 0,
-                    'organic_traffic': 0,
-                    'social_traffic': 0,
-                    'direct_traffic': 0,
-                    'referral_traffic': 0,
-                    'count': 0
-                }
-            
-            ga4_by_date[date]['page_views'] += metric.page_views
-            ga4_by_date[date]['unique_visitors'] += metric.unique_page_views
-            ga4_by_date[date]['sessions'] += metric.sessions
-            ga4_by_date[date]['bounce_rate'] += metric.bounce_rate
-            ga4_by_date[date]['avg_time_on_page'] += metric.avg_session_duration
-            ga4_by_date[date]['count'] += 1
-
-            # Categorize traffic sources
-            if metric.medium == 'organic':
-                ga4_by_date[date]['organic_traffic'] += metric.page_views
-            elif metric.medium == 'social':
-                ga4_by_date[date]['social_traffic'] += metric.page_views
-            elif metric.medium == '(none)' and metric.source == '(direct)':
-                ga4_by_date[date]['direct_traffic'] += metric.page_views
-            else:
-                ga4_by_date[date]['referral_traffic'] += metric.page_views
-
-        # Group GSC metrics by date
-        gsc_by_date = {}
-        for metric in gsc_metrics:
-            date = metric.date
-            if date not in gsc_by_date:
-                gsc_by_date[date] = {
-                    'clicks': 0,
-                    'impressions': 0,
-                    'ctr': 0,
-                    'position': 0,
-                    'count': 0
-                }
-            
-            gsc_by_date[date]['clicks'] += metric.clicks
-            gsc_by_date[date]['impressions'] += metric.impressions
-            gsc_by_date[date]['ctr'] += metric.ctr
-            gsc_by_date[date]['position'] += metric.position
-            gsc_by_date[date]['count'] += 1
-
-        # Calculate averages and create AnalyticsData objects
-        analytics_data = []
-        all_dates = set(ga4_by_date.keys()) | set(gsc_by_date.keys())
-
-        for date in all_dates:
-            ga4_data = ga4_by_date.get(date, {})
-            gsc_data = gsc_by_date.get(date, {})
-
-            # Calculate averages
-            ga4_count = ga4_data.get('count', 1)
-            gsc_count = gsc_data.get('count', 1)
-
-            analytics = AnalyticsData(
-                post_id=post_id,
-                platform='web',
-                date=date,
-                page_views=ga4_data.get('page_views', 0),
-                unique_visitors=ga4_data.get('unique_visitors', 0),
-                sessions=ga4_data.get('sessions', 0),
-                bounce_rate=ga4_data.get('bounce_rate', 0) / ga4_count if ga4_count > 0 else 0,
-                avg_time_on_page=ga4_data.get('avg_time_on_page', 0) / ga4_count if ga4_count > 0 else 0,
-                clicks=gsc_data.get('clicks', 0),
-                impressions=gsc_data.get('impressions', 0),
-                ctr=gsc_data.get('ctr', 0) / gsc_count if gsc_count > 0 else 0,
-                position=gsc_data.get('position', 0) / gsc_count if gsc_count > 0 else 0,
-                organic_traffic=ga4_data.get('organic_traffic', 0),
-                social_traffic=ga4_data.get('social_traffic', 0),
-                direct_traffic=ga4_data.get('direct_traffic', 0),
-                referral_traffic=ga4_data.get('referral_traffic', 0)
-            )
-            analytics_data.append(analytics)
-
-        return analytics_data
-
-    async def save_analytics_data(self, analytics_data: List[AnalyticsData]):
-        """Save analytics data to database"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor() as cur:
-                for data in analytics_data:
-                    await cur.execute("""
-                        INSERT INTO analytics (
-                            post_id, platform, date, page_views, unique_visitors, sessions,
-                            bounce_rate, avg_time_on_page, clicks, impressions, ctr, position,
-                            organic_traffic, social_traffic, direct_traffic, referral_traffic,
-                            created_at, updated_at
-                        ) VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                        ) ON CONFLICT (post_id, platform, date) 
-                        DO UPDATE SET 
-                            page_views = EXCLUDED.page_views,
-                            unique_visitors = EXCLUDED.unique_visitors,
-                            sessions = EXCLUDED.sessions,
-                            bounce_rate = EXCLUDED.bounce_rate,
-                            avg_time_on_page = EXCLUDED.avg_time_on_page,
-                            clicks = EXCLUDED.clicks,
-                            impressions = EXCLUDED.impressions,
-                            ctr = EXCLUDED.ctr,
-                            position = EXCLUDED.position,
-                            organic_traffic = EXCLUDED.organic_traffic,
-                            social_traffic = EXCLUDED.social_traffic,
-                            direct_traffic = EXCLUDED.direct_traffic,
-                            referral_traffic = EXCLUDED.referral_traffic,
-                            updated_at = EXCLUDED.updated_at
-                    """, (
-                        data.post_id,
-                        data.platform,
-                        data.date,
-                        data.page_views,
-                        data.unique_visitors,
-                        data.sessions,
-                        data.bounce_rate,
-                        data.avg_time_on_page,
-                        data.clicks,
-                        data.impressions,
-                        data.ctr,
-                        data.position,
-                        data.organic_traffic,
-                        data.social_traffic,
-                        data.direct_traffic,
-                        data.referral_traffic,
-                        datetime.now(),
-                        datetime.now()
-                    ))
-                
-                await conn.commit()
+            logger.error(f"Error fetching GSC metrics for {page_url}: {e}")
+            return gsc_columns(0)
+
+    async def save_metrics(self, post_id: str, ga4_metrics: Dict[str, np.ndarray], ga4_traffic: Dict[str, np.ndarray], gsc_metrics: Dict[str, np.ndarray]) -> str:
+        """Stage raw report rows and let Postgres aggregate them into analytics by date"""
+        pool = await self.get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                for (table, columns, ddl), metrics in zip(STAGING_TABLES, (ga4_metrics, ga4_traffic, gsc_metrics)):
+                    await conn.execute(f"CREATE TEMP TABLE {table} ({ddl}) ON COMMIT DROP")
+                    await conn.copy_records_to_table(
+                        table,
+                        records=zip(*(metrics[column].tolist() for column in columns)),
+                        columns=columns
+                    )
+
+                return await conn.execute(ANALYTICS_UPSERT_SQL, post_id)
 
     async def process_metrics_for_post(self, post: Dict[str, Any]):
         """Process metrics for a single post"""
         try:
-            print(f"Processing metrics for post: {post['title']}")
+            logger.debug("Processing metrics for post: %s", post['title'])
             
             # Extract page path from URL
-            page_path = post['url'].split('/', 3)[-1] if len(post['url'].split('/', 3)) > 3 else '/'
+            page_path = url_to_path(post['url'])
             
             # Fetch GA4 metrics
-            ga4_metrics = await self.fetch_ga4_page_metrics(page_path)
-            print(f"Fetched {len(ga4_metrics)} GA4 metrics")
+            ga4_metrics, ga4_traffic = await self.fetch_ga4_page_metrics(page_path)
+            logger.debug("Fetched %d GA4 metrics", len(ga4_metrics['date']))
             
             # Fetch GSC metrics
             gsc_metrics = await self.fetch_gsc_page_metrics(post['url'])
-            print(f"Fetched {len(gsc_metrics)} GSC metrics")
-            
-            # Aggregate metrics
-            analytics_data = await self.aggregate_metrics(post['id'], ga4_metrics, gsc_metrics)
-            print(f"Aggregated {len(analytics_data)} analytics records")
+            logger.debug("Fetched %d GSC metrics", len(gsc_metrics['date']))
             
-            # Save to database
-            await self.save_analytics_data(analytics_data)
-            print(f"Saved analytics data for post {post['id']}")
+            # Aggregate and save to database
+            status = await self.save_metrics(post['id'], ga4_metrics, ga4_traffic, gsc_metrics)
+            logger.debug("Saved analytics data for post %s (%s)", post['id'], status)
             
         except Exception as e:
-            print(f"Error processing metrics for post {post['id']}: {e}")
+            logger.error(f"Error processing metrics for post {post['id']}: {e}")
 
     async def run_metrics_collection(self):
         """Main function to run metrics collection for all published posts"""
         try:
-            print("Starting metrics collection...")
+            logger.info("Starting metrics collection...")
             
             # Get all published posts
             posts = await self.get_published_posts()
-            print(f"Found {len(posts)} published posts")
+            logger.info(f"Found {len(posts)} published posts")
             
             # Process metrics for each post
             for post in posts:
@@ -437,10 +451,10 @@ class MetricsWorker:
                 # Add delay to avoid rate limiting
                 await asyncio.sleep(1)
             
-            print("Metrics collection completed")
+            logger.info("Metrics collection completed")
             
         except Exception as e:
-            print(f"Error in metrics collection: {e}")
+            logger.error(f"Error in metrics collection: {e}")
 
     async def process_metrics_request(self) -> Dict[str, Any]:
         """Main processing function for metrics collection requests"""
@@ -464,9 +478,12 @@ async def main():
     worker = MetricsWorker()
     
     # Test metrics collection
-    result = await worker.process_metrics_request()
+    try:
+        result = await worker.process_metrics_request()
+    finally:
+        await worker.close()
     print("Metrics Collection Result:")
-    print(json.dumps(result, indent=2, default=str))
+    print(orjson.dumps(result, default=str, option=orjson.OPT_INDENT_2).decode())
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -4,19 +4,187 @@ Publish Worker - WordPress API integration for publishing posts and media
 """
 
 import asyncio
-import json
 import base64
-from typing import Dict, List, Optional, Any
+import json
+import atexit
+import logging
+import hashlib
+import html
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Any, AsyncIterable, Tuple
 from dataclasses import dataclass
-from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import requests
-from requests.auth import HTTPBasicAuth
-import xmlrpc.client
-from urllib.parse import urljoin, urlparse
-import mimetypes
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import asyncpg
+import aiohttp
+import ahocorasick
+import mistune
+import orjson
+from tenacity import (
+    before_sleep_log, retry, retry_if_exception, retry_if_exception_type, stop_after_attempt,
+    wait_random_exponential
+)
+from urllib.parse import urljoin
 import os
+import queue
+import re
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# Configure logging: handlers run on a listener thread fed by a queue, so
+# concurrent publishes never contend on stdout from inside the event loop
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+log_listener = QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logger = logging.getLogger(__name__)
+logger.addHandler(QueueHandler(log_queue))
+logger.setLevel(os.getenv('LOG_LEVEL', 'info').upper())
+logger.propagate = False
+
+# WordPress responses worth retrying: rate limiting and gateway/proxy errors
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+# Upper bound on a single Retry-After wait, in seconds
+MAX_RETRY_AFTER = 60
+
+class TransientHTTPError(Exception):
+    """A WordPress response that is expected to succeed if retried later"""
+
+    def __init__(self, status: int, retry_after: Optional[float]):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+class StorageUnavailableError(TransientHTTPError):
+    """A transient S3/MinIO response (429/5xx) while opening a media download"""
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delay in seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+backoff_wait = wait_random_exponential(multiplier=1, max=30)
+
+def wait_for_retry(retry_state) -> float:
+    """Wait as long as Retry-After asks, else exponential backoff with full jitter"""
+    error = retry_state.outcome.exception()
+    if isinstance(error, TransientHTTPError) and error.retry_after is not None:
+        return error.retry_after
+    return backoff_wait(retry_state)
+
+# Retry policy for WordPress calls: up to 4 attempts on transient errors
+wp_retry = retry(
+    retry=retry_if_exception_type((TransientHTTPError, aiohttp.ClientError, asyncio.TimeoutError)),
+    stop=stop_after_attempt(4),
+    wait=wait_for_retry,
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+
+def is_safe_to_resend(error: BaseException) -> bool:
+    """Whether a failed create request certainly never created anything in WordPress
+
+    Only a 429 rejection or a failure to connect qualify: after a timeout or
+    5xx the request may already have been applied, and sending it again
+    would create a duplicate post or media item.
+    """
+    if isinstance(error, StorageUnavailableError):
+        return True
+    if isinstance(error, TransientHTTPError):
+        return error.status == 429
+    return isinstance(error, aiohttp.ClientConnectorError)
+
+# Retry policy for non-idempotent WordPress creates: only resend requests that never landed
+wp_create_retry = retry(
+    retry=retry_if_exception(is_safe_to_resend),
+    stop=stop_after_attempt(4),
+    wait=wait_for_retry,
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+
+# Request headers for JSON bodies serialized with json_body()
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+def json_body(data: Any) -> bytes:
+    """Serialize a WordPress request body straight to bytes with orjson"""
+    return orjson.dumps(data)
+
+# Hot publish-path queries. Kept as constant SQL text so asyncpg's per-connection
+# statement cache reuses the server-side prepared statements across publishes.
+GET_POST_SQL = """
+    SELECT p.*, d.content, d.citations, o.outline_data
+    FROM posts p
+    LEFT JOIN drafts d ON p.id = d.post_id
+    LEFT JOIN outlines o ON p.id = o.post_id
+    WHERE p.id = $1
+"""
+
+GET_IMAGES_SQL = """
+    SELECT * FROM images 
+    WHERE post_id = $1 AND status = 'processed'
+    ORDER BY created_at
+"""
+
+# The publishes upsert runs as a data-modifying CTE of the posts update:
+# one statement (hence atomic) and one round-trip
+PUBLISH_STATUS_SQL = """
+    WITH publish AS (
+        INSERT INTO publishes (post_id, platform, platform_post_id, url, status, published_at)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        ON CONFLICT (post_id, platform) 
+        DO UPDATE SET 
+            platform_post_id = EXCLUDED.platform_post_id,
+            url = EXCLUDED.url,
+            status = EXCLUDED.status,
+            published_at = EXCLUDED.published_at
+    )
+    UPDATE posts 
+    SET status = 'published', updated_at = $6
+    WHERE id = $1
+"""
+
+# Candidate tag words: runs of 3+ ASCII letters
+WORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+
+# Common words never used as tags
+STOP_WORDS = frozenset({
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was',
+    'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'man', 'new', 'now',
+    'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she',
+    'too', 'use', 'with', 'this', 'that', 'they', 'have', 'from', 'word', 'what',
+    'said', 'each', 'which', 'their', 'time', 'will', 'would', 'there', 'could',
+    'been', 'call', 'first', 'find', 'made', 'may', 'part', 'over', 'come', 'know',
+    'take', 'than', 'into', 'just', 'more', 'other', 'about', 'many', 'then', 'them',
+    'these', 'so', 'some', 'make', 'like', 'go', 'no', 'my', 'long', 'down'
+})
+
+# Phrases that, when found anywhere in the content, imply a category
+CATEGORY_TRIGGERS = {
+    'ai': 'Technology',
+    'artificial intelligence': 'Technology',
+    'machine learning': 'Technology',
+    'marketing': 'Marketing',
+    'seo': 'Marketing',
+    'content': 'Marketing',
+    'business': 'Business',
+    'strategy': 'Business',
+    'growth': 'Business',
+    'productivity': 'Productivity',
+    'tools': 'Productivity',
+    'automation': 'Productivity'
+}
 
 @dataclass
 class WordPressPost:
@@ -24,15 +192,16 @@ class WordPressPost:
     content: str
     excerpt: str
     status: str  # 'draft', 'publish', 'private', 'pending'
-    categories: List[str]
-    tags: List[str]
+    categories: List[int]  # WordPress term IDs
+    tags: List[int]  # WordPress term IDs
     featured_media_id: Optional[int]
     meta: Dict[str, Any]
 
 @dataclass
 class WordPressMedia:
     file_name: str
-    file_data: bytes
+    body: AsyncIterable[bytes]  # streamed straight from storage, never fully buffered
+    content_length: Optional[int]
     mime_type: str
     alt_text: str
     caption: str
@@ -47,6 +216,11 @@ class PublishResult:
     warnings: List[str]
 
 class WordPressPublisher:
+    # Number of rendered drafts kept in the markdown -> HTML LRU cache
+    HTML_CACHE_SIZE = 256
+    # Seconds that fetched WordPress categories/tags are reused
+    WP_METADATA_TTL = 300
+
     def __init__(self):
         # Database connection
         self.db_config = {
@@ -63,138 +237,196 @@ class WordPressPublisher:
             'username': 'YOUR_WP_USERNAME',
             'password': 'YOUR_WP_PASSWORD',
             'app_password': 'YOUR_APP_PASSWORD',  # For modern WP sites
-            'use_xmlrpc': False  # Set to True for older WP sites
+            'use_xmlrpc': False,  # Set to True for older WP sites
+            'max_concurrent_uploads': 5
+        }
+
+        # Basic auth header, encoded once and sent as a session default header.
+        # Application Passwords (modern WP) and legacy passwords both use it.
+        credentials = f"{self.wp_config['username']}:{self.wp_config.get('app_password') or self.wp_config['password']}"
+        self._auth_header = {
+            'Authorization': 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
         }
 
-    async def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_config)
+        # Markdown renderer, built once and reused for every post
+        self._md = mistune.create_markdown(escape=False, plugins=['table', 'strikethrough'])
+        self._html_cache: OrderedDict[bytes, str] = OrderedDict()
+
+        # Aho-Corasick automaton over the category trigger phrases
+        self._category_automaton = ahocorasick.Automaton()
+        for trigger, category in CATEGORY_TRIGGERS.items():
+            self._category_automaton.add_word(trigger, category)
+        self._category_automaton.make_automaton()
+
+        # Shared database pool and HTTP session, created on first use
+        self._db_pool: Optional[asyncpg.Pool] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._storage_session: Optional[aiohttp.ClientSession] = None
+
+        # Monotonic time before which WordPress calls wait, set by 429 Retry-After
+        self._rate_limited_until = 0.0
+
+        # WordPress categories/tags as (fetched_at, terms), per taxonomy
+        self._wp_metadata_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._wp_metadata_locks = {'categories': asyncio.Lock(), 'tags': asyncio.Lock()}
+
+        # Lowercased term name -> WordPress term ID, per taxonomy, kept for the process lifetime
+        self._term_ids: Dict[str, Dict[str, int]] = {'categories': {}, 'tags': {}}
+
+    async def get_db_pool(self) -> asyncpg.Pool:
+        """Get the shared database connection pool"""
+        if self._db_pool is None:
+            self._db_pool = await asyncpg.create_pool(
+                min_size=2, max_size=10, statement_cache_size=1024, **self.db_config
+            )
+        return self._db_pool
+
+    async def close(self):
+        """Close the shared HTTP sessions and database pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._storage_session is not None:
+            await self._storage_session.close()
+            self._storage_session = None
+        if self._db_pool is not None:
+            await self._db_pool.close()
+            self._db_pool = None
 
     async def get_post_data(self, post_id: str) -> Dict[str, Any]:
         """Fetch post data including content and metadata"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                await cur.execute("""
-                    SELECT p.*, d.content, d.citations, o.outline_data
-                    FROM posts p
-                    LEFT JOIN drafts d ON p.id = d.post_id
-                    LEFT JOIN outlines o ON p.id = o.post_id
-                    WHERE p.id = %s
-                """, (post_id,))
-                post_data = await cur.fetchone()
-                
-                if not post_data:
-                    raise ValueError(f"Post {post_id} not found")
-                
-                return dict(post_data)
+        pool = await self.get_db_pool()
+        async with pool.acquire() as conn:
+            post_data = await conn.fetchrow(GET_POST_SQL, post_id)
+            
+            if not post_data:
+                raise ValueError(f"Post {post_id} not found")
+            
+            return dict(post_data)
 
     async def get_post_images(self, post_id: str) -> List[Dict[str, Any]]:
         """Fetch images associated with the post"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                await cur.execute("""
-                    SELECT * FROM images 
-                    WHERE post_id = %s AND status = 'processed'
-                    ORDER BY created_at
-                """, (post_id,))
-                images = await cur.fetchall()
-                
-                return [dict(image) for image in images]
+        pool = await self.get_db_pool()
+        async with pool.acquire() as conn:
+            images = await conn.fetch(GET_IMAGES_SQL, post_id)
+            
+            return [dict(image) for image in images]
 
     def convert_markdown_to_html(self, markdown_content: str) -> str:
-        """Convert markdown content to HTML for WordPress"""
-        # Simple markdown to HTML conversion
-        # In production, use a proper markdown parser like markdown2 or python-markdown
-        
-        html = markdown_content
+        """Convert markdown content to HTML for WordPress, memoized by content hash"""
+        key = hashlib.blake2b(markdown_content.encode(), digest_size=16).digest()
+        rendered = self._html_cache.get(key)
+        if rendered is not None:
+            self._html_cache.move_to_end(key)
+            return rendered
         
-        # Headers
-        html = html.replace('# ', '<h1>').replace('\n# ', '</h1>\n<h1>')
-        html = html.replace('## ', '<h2>').replace('\n## ', '</h2>\n<h2>')
-        html = html.replace('### ', '<h3>').replace('\n### ', '</h3>\n<h3>')
-        
-        # Bold and italic
-        html = html.replace('**', '<strong>').replace('**', '</strong>')
-        html = html.replace('*', '<em>').replace('*', '</em>')
-        
-        # Code
-        html = html.replace('`', '<code>').replace('`', '</code>')
-        
-        # Links
-        import re
-        html = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2">\1</a>', html)
-        
-        # Lists
-        html = re.sub(r'^- (.+)$', r'<li>\1</li>', html, flags=re.MULTILINE)
-        html = re.sub(r'^(\d+)\. (.+)$', r'<li>\2</li>', html, flags=re.MULTILINE)
-        
-        # Paragraphs
-        html = re.sub(r'\n\n', '</p>\n<p>', html)
-        html = f'<p>{html}</p>'
-        
-        return html
-
-    def get_auth_headers(self) -> Dict[str, str]:
-        """Get authentication headers for WordPress API"""
-        if self.wp_config.get('app_password'):
-            # Use Application Passwords (recommended for modern WP)
-            credentials = f"{self.wp_config['username']}:{self.wp_config['app_password']}"
-            encoded_credentials = base64.b64encode(credentials.encode()).decode()
-            return {
-                'Authorization': f'Basic {encoded_credentials}',
-                'Content-Type': 'application/json'
-            }
-        else:
-            # Use basic auth (legacy)
-            return {
-                'Content-Type': 'application/json'
-            }
+        rendered = self._md(markdown_content)
+        self._html_cache[key] = rendered
+        if len(self._html_cache) > self.HTML_CACHE_SIZE:
+            self._html_cache.popitem(last=False)
+        return rendered
 
-    def get_auth_auth(self) -> Optional[HTTPBasicAuth]:
-        """Get basic auth for requests"""
-        if not self.wp_config.get('app_password'):
-            return HTTPBasicAuth(
-                self.wp_config['username'],
-                self.wp_config['password']
+    def get_http_session(self) -> aiohttp.ClientSession:
+        """Get the shared keep-alive HTTP session used for all WordPress API calls"""
+        if self._session is None or self._session.closed:
+            # aiohttp enables TCP_NODELAY on every connection it opens. JSON
+            # bodies are passed as pre-serialized bytes (json_body) so they go
+            # out with a Content-Length instead of chunked; only media
+            # uploads stream an iterable body.
+            self._session = aiohttp.ClientSession(
+                headers=self._auth_header,
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=30)
             )
-        return None
+        return self._session
+
+    def get_storage_session(self) -> aiohttp.ClientSession:
+        """Get the HTTP session used to read media from S3/MinIO (no WordPress credentials)"""
+        if self._storage_session is None or self._storage_session.closed:
+            self._storage_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+        return self._storage_session
+
+    async def send_wp_request(self, method: str, url: str, read_body: bool = True, **kwargs) -> Tuple[int, Any]:
+        """Send one WordPress API request, returning its status and JSON (or text) body
+
+        Retryable statuses raise TransientHTTPError. A 429 with Retry-After
+        also holds back every later request until that delay has passed.
+        """
+        delay = self._rate_limited_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        async with self.get_http_session().request(method, url, **kwargs) as response:
+            if response.status in RETRYABLE_STATUSES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if response.status == 429 and retry_after is not None:
+                    self._rate_limited_until = max(self._rate_limited_until, time.monotonic() + retry_after)
+                raise TransientHTTPError(response.status, retry_after)
+            
+            if not read_body:
+                return response.status, None
+            if response.content_type == 'application/json':
+                return response.status, await response.json(loads=orjson.loads)
+            return response.status, await response.text()
+
+    @wp_retry
+    async def wp_request(self, method: str, url: str, read_body: bool = True, **kwargs) -> Tuple[int, Any]:
+        """Send a WordPress API request, retrying transient failures with backoff"""
+        return await self.send_wp_request(method, url, read_body=read_body, **kwargs)
+
+    @wp_create_retry
+    async def wp_create_request(self, url: str, **kwargs) -> Tuple[int, Any]:
+        """POST a new WordPress object, retrying only failures that never reached the server"""
+        return await self.send_wp_request('POST', url, **kwargs)
 
     async def upload_media_to_wordpress(self, media: WordPressMedia) -> Optional[int]:
-        """Upload media file to WordPress"""
+        """Upload media file to WordPress
+
+        The file is sent as the raw request body (the WP REST media endpoint
+        accepts this with a Content-Disposition filename) so it can be
+        streamed with a known Content-Length; alt text and caption go in
+        the query string.
+        """
         try:
             # Prepare the media upload
             media_url = urljoin(self.wp_config['api_url'], 'media')
             
-            # Create multipart form data
-            files = {
-                'file': (media.file_name, media.file_data, media.mime_type)
+            headers = {
+                'Content-Type': media.mime_type,
+                'Content-Disposition': f'attachment; filename="{media.file_name}"'
             }
+            if media.content_length is not None:
+                headers['Content-Length'] = str(media.content_length)
             
-            data = {
+            params = {
                 'alt_text': media.alt_text,
                 'caption': media.caption,
                 'description': media.caption
             }
             
-            # Upload media
-            response = requests.post(
+            # Upload media (not retried here: the body stream can't be replayed)
+            status, media_data = await self.send_wp_request(
+                'POST',
                 media_url,
-                files=files,
-                data=data,
-                headers=self.get_auth_headers(),
-                auth=self.get_auth_auth(),
-                timeout=30
+                data=media.body,
+                params=params,
+                headers=headers
             )
             
-            if response.status_code == 201:
-                media_data = response.json()
+            if status == 201:
                 return media_data.get('id')
             else:
-                print(f"Failed to upload media: {response.status_code} - {response.text}")
+                logger.error("Failed to upload media: %s - %s", status, media_data)
                 return None
                 
+        except (TransientHTTPError, aiohttp.ClientError, asyncio.TimeoutError):
+            # Retried by stream_image_to_wordpress, which reopens the storage stream
+            raise
         except Exception as e:
-            print(f"Error uploading media: {e}")
+            logger.error("Error uploading media: %s", e)
             return None
 
     async def create_wordpress_post(self, post: WordPressPost) -> Optional[int]:
@@ -215,23 +447,20 @@ class WordPressPublisher:
                 post_data['featured_media'] = post.featured_media_id
             
             # Create post
-            response = requests.post(
+            status, data = await self.wp_create_request(
                 urljoin(self.wp_config['api_url'], 'posts'),
-                json=post_data,
-                headers=self.get_auth_headers(),
-                auth=self.get_auth_auth(),
-                timeout=30
+                data=json_body(post_data),
+                headers=JSON_HEADERS
             )
             
-            if response.status_code == 201:
-                post_data = response.json()
-                return post_data.get('id')
+            if status == 201:
+                return data.get('id')
             else:
-                print(f"Failed to create post: {response.status_code} - {response.text}")
+                logger.error("Failed to create post: %s - %s", status, data)
                 return None
                 
         except Exception as e:
-            print(f"Error creating post: {e}")
+            logger.error("Error creating post: %s", e)
             return None
 
     async def update_wordpress_post(self, wp_post_id: int, post: WordPressPost) -> bool:
@@ -252,149 +481,223 @@ class WordPressPublisher:
                 post_data['featured_media'] = post.featured_media_id
             
             # Update post
-            response = requests.put(
+            status, _ = await self.wp_request(
+                'PUT',
                 urljoin(self.wp_config['api_url'], f'posts/{wp_post_id}'),
-                json=post_data,
-                headers=self.get_auth_headers(),
-                auth=self.get_auth_auth(),
-                timeout=30
+                data=json_body(post_data),
+                headers=JSON_HEADERS
             )
             
-            return response.status_code == 200
+            return status == 200
                 
         except Exception as e:
-            print(f"Error updating post: {e}")
+            logger.error("Error updating post: %s", e)
             return False
 
-    async def get_wordpress_categories(self) -> List[Dict[str, Any]]:
-        """Get available categories from WordPress"""
+    async def fetch_wordpress_terms(self, taxonomy: str) -> Optional[List[Dict[str, Any]]]:
+        """Fetch all terms of a taxonomy ('categories' or 'tags') from WordPress"""
         try:
-            response = requests.get(
-                urljoin(self.wp_config['api_url'], 'categories'),
-                headers=self.get_auth_headers(),
-                auth=self.get_auth_auth(),
-                timeout=10
+            status, terms = await self.wp_request(
+                'GET',
+                urljoin(self.wp_config['api_url'], taxonomy),
+                params={'per_page': 100},
+                timeout=aiohttp.ClientTimeout(total=10)
             )
             
-            if response.status_code == 200:
-                return response.json()
+            if status == 200:
+                return terms
             else:
-                print(f"Failed to get categories: {response.status_code}")
-                return []
+                logger.error("Failed to get %s: %s", taxonomy, status)
+                return None
                 
         except Exception as e:
-            print(f"Error getting categories: {e}")
-            return []
+            logger.error("Error getting %s: %s", taxonomy, e)
+            return None
 
-    async def get_wordpress_tags(self) -> List[Dict[str, Any]]:
-        """Get available tags from WordPress"""
+    async def get_cached_wordpress_terms(self, taxonomy: str) -> List[Dict[str, Any]]:
+        """Get taxonomy terms, refetching only after WP_METADATA_TTL seconds"""
+        async with self._wp_metadata_locks[taxonomy]:
+            cached = self._wp_metadata_cache.get(taxonomy)
+            if cached and time.monotonic() - cached[0] < self.WP_METADATA_TTL:
+                return cached[1]
+            
+            terms = await self.fetch_wordpress_terms(taxonomy)
+            if terms is None:
+                # Don't cache failures; the next publish retries the fetch
+                return []
+            
+            self._wp_metadata_cache[taxonomy] = (time.monotonic(), terms)
+            return terms
+
+    def clear_wp_metadata_cache(self):
+        """Drop cached categories/tags and term IDs, e.g. after changing wp_config"""
+        self._wp_metadata_cache.clear()
+        for term_ids in self._term_ids.values():
+            term_ids.clear()
+
+    async def create_wordpress_term(self, taxonomy: str, name: str) -> Optional[int]:
+        """Create a category or tag in WordPress, returning its term ID"""
         try:
-            response = requests.get(
-                urljoin(self.wp_config['api_url'], 'tags'),
-                headers=self.get_auth_headers(),
-                auth=self.get_auth_auth(),
-                timeout=10
+            status, data = await self.wp_request(
+                'POST',
+                urljoin(self.wp_config['api_url'], taxonomy),
+                data=json_body({'name': name}),
+                headers=JSON_HEADERS
             )
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Failed to get tags: {response.status_code}")
-                return []
+            if status == 201:
+                return data.get('id')
+            
+            # WordPress rejects duplicates but reports the existing term's ID
+            if isinstance(data, dict) and data.get('code') == 'term_exists':
+                return data.get('data', {}).get('term_id')
+            
+            logger.error("Failed to create %s term %s: %s", taxonomy, name, status)
+            return None
                 
         except Exception as e:
-            print(f"Error getting tags: {e}")
-            return []
+            logger.error("Error creating %s term %s: %s", taxonomy, name, e)
+            return None
 
-    def extract_categories_from_content(self, content: str, target_keyword: str) -> List[str]:
-        """Extract relevant categories from content and target keyword"""
-        categories = []
+    async def resolve_term_ids(self, names: List[str], taxonomy: str) -> List[int]:
+        """Map category/tag names to WordPress term IDs, creating missing terms once"""
+        term_ids = self._term_ids[taxonomy]
         
-        # Simple category extraction based on content analysis
-        content_lower = content.lower()
-        
-        # Technology-related categories
-        if any(word in content_lower for word in ['ai', 'artificial intelligence', 'machine learning']):
-            categories.append('Technology')
+        if any(name.lower() not in term_ids for name in names):
+            for term in await self.get_cached_wordpress_terms(taxonomy):
+                term_ids.setdefault(html.unescape(term['name']).lower(), term['id'])
         
-        if any(word in content_lower for word in ['marketing', 'seo', 'content']):
-            categories.append('Marketing')
+        missing = [name for name in names if name.lower() not in term_ids]
+        if missing:
+            created = await asyncio.gather(*(self.create_wordpress_term(taxonomy, name) for name in missing))
+            for name, term_id in zip(missing, created):
+                if term_id is not None:
+                    term_ids[name.lower()] = term_id
         
-        if any(word in content_lower for word in ['business', 'strategy', 'growth']):
-            categories.append('Business')
-        
-        if any(word in content_lower for word in ['productivity', 'tools', 'automation']):
-            categories.append('Productivity')
+        return [term_ids[name.lower()] for name in names if name.lower() in term_ids]
+
+    async def get_wordpress_categories(self) -> List[Dict[str, Any]]:
+        """Get available categories from WordPress"""
+        return await self.get_cached_wordpress_terms('categories')
+
+    async def get_wordpress_tags(self) -> List[Dict[str, Any]]:
+        """Get available tags from WordPress"""
+        return await self.get_cached_wordpress_terms('tags')
+
+    def extract_categories_from_content(self, content: str, target_keyword: str,
+                                        content_lower: Optional[str] = None) -> List[str]:
+        """Extract relevant categories from content and target keyword"""
+        # Simple category extraction based on content analysis: one
+        # multi-pattern scan finds every trigger phrase in the content
+        if content_lower is None:
+            content_lower = content.lower()
+        categories = {category for _, category in self._category_automaton.iter(content_lower)}
         
         # Add target keyword as category if it's a main topic
         if target_keyword and len(target_keyword.split()) <= 3:
-            categories.append(target_keyword.title())
+            categories.add(target_keyword.title())
         
-        return list(set(categories))  # Remove duplicates
+        return list(categories)
 
-    def extract_tags_from_content(self, content: str, target_keyword: str) -> List[str]:
+    def extract_tags_from_content(self, content: str, target_keyword: str,
+                                  content_lower: Optional[str] = None) -> List[str]:
         """Extract relevant tags from content"""
-        tags = []
+        if content_lower is None:
+            content_lower = content.lower()
         
-        # Extract potential tags from content
-        import re
-        words = re.findall(r'\b[a-zA-Z]{3,}\b', content.lower())
-        
-        # Filter common words and get most frequent
-        common_words = {'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 'how', 'man', 'new', 'now', 'old', 'see', 'two', 'way', 'who', 'boy', 'did', 'its', 'let', 'put', 'say', 'she', 'too', 'use', 'with', 'this', 'that', 'they', 'have', 'from', 'word', 'what', 'said', 'each', 'which', 'their', 'time', 'will', 'would', 'there', 'could', 'been', 'call', 'first', 'find', 'made', 'may', 'part', 'over', 'come', 'know', 'take', 'than', 'into', 'just', 'more', 'other', 'about', 'many', 'then', 'them', 'these', 'so', 'some', 'her', 'would', 'make', 'like', 'into', 'him', 'time', 'has', 'two', 'more', 'go', 'no', 'way', 'could', 'my', 'than', 'first', 'been', 'call', 'who', 'its', 'now', 'find', 'long', 'down', 'day', 'did', 'get', 'come', 'made', 'may', 'part'}
-        
-        word_freq = {}
-        for word in words:
-            if word not in common_words and len(word) > 3:
-                word_freq[word] = word_freq.get(word, 0) + 1
+        # Count candidate words, skipping common words
+        word_freq = Counter(
+            word for word in WORD_RE.findall(content_lower)
+            if len(word) > 3 and word not in STOP_WORDS
+        )
         
         # Get top words as tags
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        tags = [word for word, freq in sorted_words[:10]]
+        tags = [word for word, freq in word_freq.most_common(10)]
         
         # Add target keyword as tag
         if target_keyword:
             tags.insert(0, target_keyword.lower())
         
-        return list(set(tags))  # Remove duplicates
+        return list(dict.fromkeys(tags))  # Remove duplicates, keeping order
 
     async def prepare_post_for_wordpress(self, post_data: Dict[str, Any]) -> WordPressPost:
         """Prepare post data for WordPress publishing"""
+        # Read each column once; NULLs from the draft/post join become defaults
+        post_id = post_data.get('id')
+        title = post_data.get('title') or ''
+        content = post_data.get('content') or ''
+        target_keyword = post_data.get('target_keyword') or ''
+        meta_description = post_data.get('meta_description') or ''
+        word_count = post_data.get('word_count') or 0
+        seo_score = post_data.get('seo_score') or 0
+        
         # Convert markdown to HTML
-        html_content = self.convert_markdown_to_html(post_data.get('content', ''))
+        html_content = self.convert_markdown_to_html(content)
         
-        # Extract categories and tags
-        categories = self.extract_categories_from_content(
-            post_data.get('content', ''),
-            post_data.get('target_keyword', '')
-        )
+        # Extract categories and tags, lowercasing the content only once
+        content_lower = content.lower()
+        categories = self.extract_categories_from_content(content, target_keyword, content_lower=content_lower)
+        tags = self.extract_tags_from_content(content, target_keyword, content_lower=content_lower)
         
-        tags = self.extract_tags_from_content(
-            post_data.get('content', ''),
-            post_data.get('target_keyword', '')
+        # WordPress expects term IDs, not names
+        category_ids, tag_ids = await asyncio.gather(
+            self.resolve_term_ids(categories, 'categories'),
+            self.resolve_term_ids(tags, 'tags')
         )
         
         # Prepare meta data
         meta = {
-            'target_keyword': post_data.get('target_keyword', ''),
-            'word_count': post_data.get('word_count', 0),
-            'seo_score': post_data.get('seo_score', 0),
+            'target_keyword': target_keyword,
+            'word_count': word_count,
+            'seo_score': seo_score,
             'ai_generated': True,
-            'source_post_id': post_data.get('id'),
+            'source_post_id': post_id,
             'published_at': datetime.now().isoformat()
         }
         
         return WordPressPost(
-            title=post_data.get('title', ''),
+            title=title,
             content=html_content,
-            excerpt=post_data.get('meta_description', ''),
+            excerpt=meta_description,
             status='draft',  # Start as draft for review
-            categories=categories,
-            tags=tags,
+            categories=category_ids,
+            tags=tag_ids,
             featured_media_id=None,  # Will be set after media upload
             meta=meta
         )
 
+    async def upload_post_image(self, semaphore: asyncio.Semaphore, image: Dict[str, Any]) -> Optional[int]:
+        """Upload a single post image while holding the upload semaphore"""
+        async with semaphore:
+            return await self.stream_image_to_wordpress(image)
+
+    @wp_create_retry
+    async def stream_image_to_wordpress(self, image: Dict[str, Any]) -> Optional[int]:
+        """Stream a post image from S3/MinIO into WordPress
+
+        The whole transfer is retried when storage is briefly unavailable or
+        the upload never reached WordPress; a permanent storage error or an
+        upload that may already have landed is not retried.
+        """
+        async with self.get_storage_session().get(image['url']) as storage_response:
+            if storage_response.status == 429 or storage_response.status >= 500:
+                raise StorageUnavailableError(
+                    storage_response.status,
+                    parse_retry_after(storage_response.headers.get('Retry-After'))
+                )
+            storage_response.raise_for_status()
+            
+            media = WordPressMedia(
+                file_name=image.get('filename', 'image.jpg'),
+                body=storage_response.content,
+                content_length=storage_response.content_length,
+                mime_type=image.get('mime_type', 'image/jpeg'),
+                alt_text=image.get('alt_text', ''),
+                caption=image.get('caption', '')
+            )
+            
+            return await self.upload_media_to_wordpress(media)
+
     async def publish_post_to_wordpress(self, post_id: str, publish_status: str = 'draft') -> PublishResult:
         """Main function to publish a post to WordPress"""
         result = PublishResult(
@@ -407,38 +710,34 @@ class WordPressPublisher:
         )
         
         try:
-            # Get post data
-            post_data = await self.get_post_data(post_id)
+            # Get post data and associated images concurrently
+            post_data, images = await asyncio.gather(
+                self.get_post_data(post_id),
+                self.get_post_images(post_id),
+                return_exceptions=True
+            )
             
-            # Get associated images
-            images = await self.get_post_images(post_id)
+            fetch_errors = [r for r in (post_data, images) if isinstance(r, Exception)]
+            if fetch_errors:
+                result.errors.extend(f"Publishing failed: {str(e)}" for e in fetch_errors)
+                return result
+            
+            # Upload media files concurrently, bounded by the configured limit
+            semaphore = asyncio.Semaphore(self.wp_config['max_concurrent_uploads'])
+            upload_results = await asyncio.gather(
+                *(self.upload_post_image(semaphore, image) for image in images),
+                return_exceptions=True
+            )
             
-            # Upload media files
             media_ids = []
-            featured_media_id = None
-            
-            for image in images:
-                try:
-                    # Download image data (in production, get from S3/MinIO)
-                    # For now, we'll assume the image data is available
-                    media = WordPressMedia(
-                        file_name=image.get('filename', 'image.jpg'),
-                        file_data=b'mock_image_data',  # Replace with actual image data
-                        mime_type=image.get('mime_type', 'image/jpeg'),
-                        alt_text=image.get('alt_text', ''),
-                        caption=image.get('caption', '')
-                    )
-                    
-                    wp_media_id = await self.upload_media_to_wordpress(media)
-                    if wp_media_id:
-                        media_ids.append(wp_media_id)
-                        
-                        # Set first image as featured media
-                        if not featured_media_id:
-                            featured_media_id = wp_media_id
-                            
-                except Exception as e:
-                    result.warnings.append(f"Failed to upload image {image.get('filename', 'unknown')}: {str(e)}")
+            for image, wp_media_id in zip(images, upload_results):
+                if isinstance(wp_media_id, Exception):
+                    result.warnings.append(f"Failed to upload image {image.get('filename', 'unknown')}: {str(wp_media_id)}")
+                elif wp_media_id:
+                    media_ids.append(wp_media_id)
+            
+            # Set first image as featured media (by image order, not upload completion)
+            featured_media_id = media_ids[0] if media_ids else None
             
             # Prepare WordPress post
             wp_post = await self.prepare_post_for_wordpress(post_data)
@@ -466,60 +765,37 @@ class WordPressPublisher:
 
     async def update_post_publish_status(self, post_id: str, wp_post_id: int, wp_url: str):
         """Update local post with WordPress publishing information"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute("""
-                    INSERT INTO publishes (post_id, platform, platform_post_id, url, status, published_at)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (post_id, platform) 
-                    DO UPDATE SET 
-                        platform_post_id = EXCLUDED.platform_post_id,
-                        url = EXCLUDED.url,
-                        status = EXCLUDED.status,
-                        published_at = EXCLUDED.published_at
-                """, (
-                    post_id,
-                    'wordpress',
-                    str(wp_post_id),
-                    wp_url,
-                    'published',
-                    datetime.now()
-                ))
-                
-                # Update post status
-                await cur.execute("""
-                    UPDATE posts 
-                    SET status = 'published', updated_at = %s
-                    WHERE id = %s
-                """, (datetime.now(), post_id))
-                
-                await conn.commit()
+        pool = await self.get_db_pool()
+        await pool.execute(
+            PUBLISH_STATUS_SQL,
+            post_id,
+            'wordpress',
+            str(wp_post_id),
+            wp_url,
+            'published',
+            datetime.now()
+        )
+
+    async def probe_wordpress_endpoint(self, url: str, read_json: bool = False) -> Tuple[int, Any]:
+        """GET a WordPress endpoint, returning its status and (optionally) its JSON body"""
+        return await self.wp_request('GET', url, read_body=read_json, timeout=aiohttp.ClientTimeout(total=10))
 
     async def test_wordpress_connection(self) -> Dict[str, Any]:
         """Test WordPress API connection"""
         try:
-            # Test basic connection
-            response = requests.get(
-                urljoin(self.wp_config['site_url'], 'wp-json'),
-                timeout=10
+            # Test basic connection and authentication concurrently
+            (status, _), (auth_status, user_data) = await asyncio.gather(
+                self.probe_wordpress_endpoint(urljoin(self.wp_config['site_url'], 'wp-json')),
+                self.probe_wordpress_endpoint(urljoin(self.wp_config['api_url'], 'users/me'), read_json=True)
             )
             
-            if response.status_code != 200:
+            if status != 200:
                 return {
                     'success': False,
-                    'error': f"WordPress site not accessible: {response.status_code}"
+                    'error': f"WordPress site not accessible: {status}"
                 }
             
-            # Test authentication
-            auth_response = requests.get(
-                urljoin(self.wp_config['api_url'], 'users/me'),
-                headers=self.get_auth_headers(),
-                auth=self.get_auth_auth(),
-                timeout=10
-            )
-            
-            if auth_response.status_code == 200:
-                user_data = auth_response.json()
+            if auth_status == 200:
                 return {
                     'success': True,
                     'user': user_data.get('name', 'Unknown'),
@@ -528,7 +804,7 @@ class WordPressPublisher:
             else:
                 return {
                     'success': False,
-                    'error': f"Authentication failed: {auth_response.status_code}"
+                    'error': f"Authentication failed: {auth_status}"
                 }
                 
         except Exception as e:
@@ -562,17 +838,20 @@ async def main():
     """Test the WordPress publisher"""
     publisher = WordPressPublisher()
     
-    # Test connection
-    connection_test = await publisher.test_wordpress_connection()
-    print("WordPress Connection Test:")
-    print(json.dumps(connection_test, indent=2, default=str))
-    
-    # Test publishing (with mock post ID)
-    post_id = "test-post-123"
-    result = await publisher.process_publish_request(post_id, 'draft')
-    
-    print("\nPublishing Result:")
-    print(json.dumps(result, indent=2, default=str))
+    try:
+        # Test connection
+        connection_test = await publisher.test_wordpress_connection()
+        print("WordPress Connection Test:")
+        print(json.dumps(connection_test, indent=2, default=str))
+        
+        # Test publishing (with mock post ID)
+        post_id = "test-post-123"
+        result = await publisher.process_publish_request(post_id, 'draft')
+        
+        print("\nPublishing Result:")
+        print(json.dumps(result, indent=2, default=str))
+    finally:
+        await publisher.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
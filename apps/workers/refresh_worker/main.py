@@ -4,18 +4,212 @@ Refresh Worker - Content refresh prompts (traffic drop detection)
 """
 
 import asyncio
-import json
-from typing import Dict, List, Optional, Any
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from datetime import datetime, timezone
+import asyncpg
+import httpx
 import openai
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import orjson
 
-@dataclass
+# Configure logging. Records are queued and written by a listener thread, so
+# the gathered prompt tasks never serialize on the stdout lock.
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+log_listener = QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logger = logging.getLogger(__name__)
+logger.addHandler(QueueHandler(log_queue))
+logger.setLevel(os.getenv('LOG_LEVEL', 'info').upper())
+logger.propagate = False
+
+# Week-over-week page views per published post, compared in Postgres so only
+# posts that dropped past low_drop come back. Both 7-day windows end at the
+# latest analytics date rather than today, so reporting lag isn't a drop.
+# Posts need analytics for every day of the previous (baseline) week and must
+# be older than days_threshold; the current week may have gaps, since days
+# without traffic have no analytics row.
+TRAFFIC_DROPS_SQL = """
+    WITH windows AS (
+        SELECT
+            a.post_id,
+            COALESCE(SUM(a.page_views) FILTER (WHERE a.date > b.last_date - 7), 0) AS current_traffic,
+            COALESCE(SUM(a.page_views) FILTER (WHERE a.date <= b.last_date - 7), 0) AS previous_traffic
+        FROM analytics a
+        CROSS JOIN (SELECT MAX(date) AS last_date FROM analytics) b
+        WHERE a.date > b.last_date - 14
+        GROUP BY a.post_id
+        HAVING COUNT(DISTINCT a.date) FILTER (WHERE a.date <= b.last_date - 7) = 7
+        AND SUM(a.page_views) FILTER (WHERE a.date <= b.last_date - 7) >= $1
+    ), drops AS (
+        SELECT
+            post_id, current_traffic, previous_traffic,
+            (previous_traffic - current_traffic)::float / NULLIF(previous_traffic, 0) AS drop_percentage
+        FROM windows
+    )
+    SELECT
+        p.id, p.title, p.content, p.target_keyword, p.meta_description,
+        p.created_at, p.updated_at,
+        d.current_traffic, d.previous_traffic, d.drop_percentage,
+        CURRENT_DATE - p.created_at::date AS days_since_published,
+        CASE
+            WHEN d.drop_percentage > $2 THEN 'critical'
+            WHEN d.drop_percentage > $3 THEN 'high'
+            WHEN d.drop_percentage > $4 THEN 'medium'
+            ELSE 'low'
+        END AS severity
+    FROM drops d
+    JOIN posts p ON p.id = d.post_id
+    WHERE d.drop_percentage > $5
+    AND p.created_at < NOW() - make_interval(days => $6)
+    AND EXISTS (
+        SELECT 1 FROM publishes pub
+        WHERE pub.post_id = p.id
+        AND pub.status = 'published'
+        AND pub.url IS NOT NULL
+    )
+    ORDER BY d.drop_percentage DESC
+"""
+
+INSERT_ANALYSIS_SQL = """
+    INSERT INTO content_analyses (
+        post_id, content_freshness_score, keyword_relevance_score,
+        competitor_gap_score, seo_opportunity_score, overall_refresh_score,
+        analysis_date, created_at, updated_at
+    ) VALUES (
+        $1, $2, $3, $4, $5, $6, $7, $8, $9
+    ) ON CONFLICT (post_id) 
+    DO UPDATE SET 
+        content_freshness_score = EXCLUDED.content_freshness_score,
+        keyword_relevance_score = EXCLUDED.keyword_relevance_score,
+        competitor_gap_score = EXCLUDED.competitor_gap_score,
+        seo_opportunity_score = EXCLUDED.seo_opportunity_score,
+        overall_refresh_score = EXCLUDED.overall_refresh_score,
+        analysis_date = EXCLUDED.analysis_date,
+        updated_at = EXCLUDED.updated_at
+"""
+
+INSERT_PROMPT_SQL = """
+    INSERT INTO refresh_prompts (
+        post_id, prompt_type, title, description, suggested_actions,
+        priority, status, created_at, updated_at
+    ) VALUES (
+        $1, $2, $3, $4, $5, $6, $7, $8, $9
+    )
+"""
+
+# Chat model for refresh prompts (must support JSON mode); part of every LLM cache key
+REFRESH_PROMPT_MODEL = "gpt-4o-mini"
+# Output budget for the refresh prompt JSON, which runs to about 150 tokens
+REFRESH_PROMPT_MAX_TOKENS = 220
+
+REFRESH_SYSTEM_PROMPT = (
+    "You are a content marketing expert. Analyze the given post data and generate "
+    "a refresh prompt with specific, actionable suggestions."
+)
+
+def llm_cache_key(model: str, messages: List[Dict[str, str]]) -> bytes:
+    """SHA-256 of the model and message contents, identifying an exact repeat request"""
+    digest = hashlib.sha256(model.encode('utf-8'))
+    for message in messages:
+        digest.update(b'|')
+        digest.update(message['content'].encode('utf-8'))
+    return digest.digest()
+
+FETCH_LLM_CACHE_SQL = """
+    SELECT key, response::text AS response
+    FROM llm_cache
+    WHERE key = ANY($1::bytea[])
+"""
+
+INSERT_LLM_CACHE_SQL = """
+    INSERT INTO llm_cache (key, response)
+    VALUES ($1, $2::jsonb)
+    ON CONFLICT (key) DO NOTHING
+"""
+
+# all-MiniLM-L6-v2 sentence embedding size, matching refresh_prompt_cache.embedding
+EMBEDDING_DIM = 384
+# Texts per encode batch; small batches pad less when lengths are mixed on CPU
+EMBEDDING_BATCH_SIZE = 32
+
+LOAD_PROMPT_CACHE_SQL = """
+    SELECT embedding::text AS embedding, response::text AS response
+    FROM refresh_prompt_cache
+    ORDER BY created_at DESC
+    LIMIT $1
+"""
+
+INSERT_PROMPT_CACHE_SQL = """
+    INSERT INTO refresh_prompt_cache (embedding, response)
+    VALUES ($1::vector, $2::jsonb)
+"""
+
+# Optional int8-quantized ONNX export of all-MiniLM-L6-v2, produced offline with
+#   optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 --task feature-extraction minilm-onnx/
+#   optimum-cli onnxruntime quantize --onnx_model minilm-onnx --avx512 -o minilm-onnx-int8
+# When set, embeddings run on ONNX Runtime instead of PyTorch.
+EMBEDDING_ONNX_DIR = os.getenv('EMBEDDING_ONNX_DIR')
+
+class OnnxSentenceEncoder:
+    """SentenceTransformer-compatible encode() over an ONNX Runtime export of the model"""
+
+    def __init__(self, model_dir: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = ORTModelForFeatureExtraction.from_pretrained(model_dir)
+        self.max_seq_length = 256
+
+    def encode(self, sentences: List[str], batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs) -> np.ndarray:
+        """Tokenize, run the ONNX session, mean-pool over tokens and optionally L2-normalize"""
+        embeddings = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(
+                sentences[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_seq_length, return_tensors='np'
+            )
+            token_embeddings = self.session(**inputs).last_hidden_state
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            embeddings.append((token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        
+        embeddings = np.concatenate(embeddings).astype(np.float32)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+# Sentence transformer shared by every RefreshWorker in the process, loaded on
+# first use so runs that never embed anything skip the model load entirely
+_embedding_model: Optional[Union[SentenceTransformer, OnnxSentenceEncoder]] = None
+_embedding_model_lock = threading.Lock()
+
+def get_embedding_model() -> Union[SentenceTransformer, OnnxSentenceEncoder]:
+    """Get the process-wide all-MiniLM-L6-v2 model, loading it on first call"""
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                if EMBEDDING_ONNX_DIR:
+                    _embedding_model = OnnxSentenceEncoder(EMBEDDING_ONNX_DIR)
+                else:
+                    _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+    return _embedding_model
+
+@dataclass(slots=True, frozen=True)
 class TrafficDrop:
     post_id: str
     post_title: str
@@ -26,7 +220,7 @@ class TrafficDrop:
     last_updated: datetime
     severity: str  # 'low', 'medium', 'high', 'critical'
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RefreshPrompt:
     post_id: str
     prompt_type: str  # 'traffic_drop', 'content_aging', 'competitor_update'
@@ -37,7 +231,7 @@ class RefreshPrompt:
     created_at: datetime
     status: str  # 'pending', 'in_progress', 'completed', 'dismissed'
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ContentAnalysis:
     post_id: str
     content_freshness_score: float
@@ -48,6 +242,15 @@ class ContentAnalysis:
     analysis_date: datetime
 
 class RefreshWorker:
+    # Traffic drops analyzed at once, bounding concurrent OpenAI requests
+    MAX_CONCURRENT_DROPS = 8
+    # Refresh prompt cache: contexts at least this cosine-similar reuse a response
+    PROMPT_CACHE_THRESHOLD = 0.92
+    # Cached responses kept in memory; the least recently used is replaced
+    PROMPT_CACHE_SIZE = 10000
+    # Rows allocated on the first insert; storage doubles from here up to PROMPT_CACHE_SIZE
+    PROMPT_CACHE_INITIAL_ROWS = 64
+
     def __init__(self):
         # Database connection
         self.db_config = {
@@ -57,11 +260,18 @@ class RefreshWorker:
             'password': 'postgres'
         }
         
-        # OpenAI configuration
-        openai.api_key = 'YOUR_OPENAI_API_KEY'
-        
-        # Sentence transformer for content analysis
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # OpenAI configuration: one client whose keep-alive pool covers every
+        # concurrent prompt request, so TLS connections are reused across calls
+        self.openai_client = openai.AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY', 'YOUR_OPENAI_API_KEY'),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.MAX_CONCURRENT_DROPS * 2,
+                    max_keepalive_connections=self.MAX_CONCURRENT_DROPS
+                ),
+                timeout=httpx.Timeout(60.0, connect=10.0)
+            )
+        )
         
         # Thresholds for traffic drop detection
         self.thresholds = {
@@ -72,110 +282,76 @@ class RefreshWorker:
             'min_traffic': 100,    # Minimum traffic to consider
             'days_threshold': 30,  # Days since published to consider for refresh
         }
-
-    async def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_config)
-
-    async def get_published_posts_with_analytics(self) -> List[Dict[str, Any]]:
-        """Get published posts with their analytics data"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                await cur.execute("""
-                    SELECT 
-                        p.id, p.title, p.content, p.target_keyword, p.meta_description,
-                        p.created_at, p.updated_at, pub.url, pub.platform,
-                        a.date, a.page_views, a.unique_visitors, a.clicks, a.impressions
-                    FROM posts p
-                    JOIN publishes pub ON p.id = pub.post_id
-                    LEFT JOIN analytics a ON p.id = a.post_id
-                    WHERE pub.status = 'published'
-                    AND pub.url IS NOT NULL
-                    ORDER BY p.created_at DESC
-                """)
-                posts = await cur.fetchall()
-                return [dict(post) for post in posts]
-
-    async def detect_traffic_drops(self) -> List[TrafficDrop]:
-        """Detect posts with significant traffic drops"""
-        posts = await self.get_published_posts_with_analytics()
-        traffic_drops = []
         
-        for post in posts:
-            # Group analytics by date
-            analytics_by_date = {}
-            for date, page_views in zip(post.get('date', []), post.get('page_views', [])):
-                if date and page_views:
-                    analytics_by_date[date] = page_views
-            
-            if not analytics_by_date:
-                continue
-            
-            # Calculate current vs previous period traffic
-            sorted_dates = sorted(analytics_by_date.keys())
-            if len(sorted_dates) < 14:  # Need at least 2 weeks of data
-                continue
-            
-            # Current week (last 7 days)
-            current_end = sorted_dates[-1]
-            current_start = (datetime.strptime(current_end, '%Y-%m-%d') - timedelta(days=6)).strftime('%Y-%m-%d')
-            
-            # Previous week (7 days before current)
-            prev_end = (datetime.strptime(current_start, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
-            prev_start = (datetime.strptime(prev_end, '%Y-%m-%d') - timedelta(days=6)).strftime('%Y-%m-%d')
-            
-            # Calculate traffic for both periods
-            current_traffic = sum(
-                analytics_by_date.get(date, 0) 
-                for date in sorted_dates 
-                if current_start <= date <= current_end
+        # Shared database pool, created on first use
+        self._db_pool: Optional[asyncpg.Pool] = None
+        
+        # Semantic cache of OpenAI refresh prompts: unit-norm context embeddings
+        # (first _prompt_cache_count rows used), their responses, and last-hit ticks.
+        # Persisted in refresh_prompt_cache and loaded on first use; the arrays
+        # start empty and grow geometrically as entries are added.
+        self._prompt_cache_embs = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._prompt_cache_vals: List[Dict[str, Any]] = []
+        self._prompt_cache_used = np.zeros(0, dtype=np.int64)
+        self._prompt_cache_count = 0
+        self._prompt_cache_tick = 0
+        self._prompt_cache_loaded = False
+        self._prompt_cache_lock = asyncio.Lock()
+
+    @property
+    def model(self) -> Union[SentenceTransformer, OnnxSentenceEncoder]:
+        """Sentence transformer for content analysis"""
+        return get_embedding_model()
+
+    async def get_db_pool(self) -> asyncpg.Pool:
+        """Get the shared database connection pool"""
+        if self._db_pool is None:
+            self._db_pool = await asyncpg.create_pool(
+                min_size=2, max_size=10, command_timeout=60, **self.db_config
             )
-            
-            previous_traffic = sum(
-                analytics_by_date.get(date, 0) 
-                for date in sorted_dates 
-                if prev_start <= date <= prev_end
+        return self._db_pool
+
+    async def close(self):
+        """Close the OpenAI client and the shared database pool"""
+        await self.openai_client.close()
+        if self._db_pool is not None:
+            await self._db_pool.close()
+            self._db_pool = None
+
+    async def get_traffic_drop_candidates(self) -> List[asyncpg.Record]:
+        """Get published posts whose traffic dropped past the low_drop threshold"""
+        pool = await self.get_db_pool()
+        return await pool.fetch(
+            TRAFFIC_DROPS_SQL,
+            self.thresholds['min_traffic'],
+            self.thresholds['critical_drop'],
+            self.thresholds['high_drop'],
+            self.thresholds['medium_drop'],
+            self.thresholds['low_drop'],
+            self.thresholds['days_threshold']
+        )
+
+    def detect_traffic_drops(self, posts: List[asyncpg.Record]) -> List[TrafficDrop]:
+        """Build traffic drops from the rows of get_traffic_drop_candidates"""
+        return [
+            TrafficDrop(
+                post_id=post['id'],
+                post_title=post['title'],
+                current_traffic=post['current_traffic'],
+                previous_traffic=post['previous_traffic'],
+                drop_percentage=post['drop_percentage'],
+                days_since_published=post['days_since_published'],
+                last_updated=post['updated_at'],
+                severity=post['severity']
             )
-            
-            if previous_traffic < self.thresholds['min_traffic']:
-                continue
-            
-            # Calculate drop percentage
-            drop_percentage = (previous_traffic - current_traffic) / previous_traffic
-            
-            if drop_percentage > self.thresholds['low_drop']:
-                # Determine severity
-                if drop_percentage > self.thresholds['critical_drop']:
-                    severity = 'critical'
-                elif drop_percentage > self.thresholds['high_drop']:
-                    severity = 'high'
-                elif drop_percentage > self.thresholds['medium_drop']:
-                    severity = 'medium'
-                else:
-                    severity = 'low'
-                
-                # Calculate days since published
-                days_since_published = (datetime.now() - post['created_at']).days
-                
-                traffic_drop = TrafficDrop(
-                    post_id=post['id'],
-                    post_title=post['title'],
-                    current_traffic=current_traffic,
-                    previous_traffic=previous_traffic,
-                    drop_percentage=drop_percentage,
-                    days_since_published=days_since_published,
-                    last_updated=post['updated_at'],
-                    severity=severity
-                )
-                traffic_drops.append(traffic_drop)
-        
-        return traffic_drops
+            for post in posts
+        ]
 
-    async def analyze_content_freshness(self, post: Dict[str, Any]) -> ContentAnalysis:
-        """Analyze content freshness and relevance"""
+    async def analyze_content_freshness(self, post: Dict[str, Any], now: Optional[datetime] = None) -> ContentAnalysis:
+        """Analyze content freshness and relevance as of now (default: the current UTC time)"""
         try:
             # Get current date for comparison
-            current_date = datetime.now()
+            current_date = now or datetime.now(timezone.utc)
             days_since_published = (current_date - post['created_at']).days
             days_since_updated = (current_date - post['updated_at']).days
             
@@ -209,15 +385,153 @@ class RefreshWorker:
                 analysis_date=current_date
             )
             
-        except Exception as e:
-            print(f"Error analyzing content freshness for post {post['id']}: {e}")
+        except Exception:
+            logger.exception("Error analyzing content freshness for post %s", post['id'])
+            return None
+
+    async def load_prompt_cache(self):
+        """Load the most recently cached refresh prompt responses into memory, once"""
+        async with self._prompt_cache_lock:
+            if self._prompt_cache_loaded:
+                return
+            
+            try:
+                pool = await self.get_db_pool()
+                rows = await pool.fetch(LOAD_PROMPT_CACHE_SQL, self.PROMPT_CACHE_SIZE)
+                for row in rows:
+                    self.add_to_prompt_cache(
+                        np.array(orjson.loads(row['embedding']), dtype=np.float32),
+                        orjson.loads(row['response'])
+                    )
+            except Exception:
+                logger.exception("Error loading refresh prompt cache")
+            
+            self._prompt_cache_loaded = True
+
+    def add_to_prompt_cache(self, embedding: np.ndarray, response: Dict[str, Any]):
+        """Add a response to the in-memory cache, replacing the least recently used when full"""
+        if self._prompt_cache_count < self.PROMPT_CACHE_SIZE:
+            if self._prompt_cache_count == len(self._prompt_cache_used):
+                self._grow_prompt_cache()
+            slot = self._prompt_cache_count
+            self._prompt_cache_count += 1
+            self._prompt_cache_vals.append(response)
+        else:
+            slot = int(self._prompt_cache_used.argmin())
+            self._prompt_cache_vals[slot] = response
+        
+        self._prompt_cache_tick += 1
+        self._prompt_cache_embs[slot] = embedding
+        self._prompt_cache_used[slot] = self._prompt_cache_tick
+
+    def _grow_prompt_cache(self):
+        """Double the cache storage, capped at PROMPT_CACHE_SIZE rows"""
+        capacity = min(max(2 * len(self._prompt_cache_used), self.PROMPT_CACHE_INITIAL_ROWS), self.PROMPT_CACHE_SIZE)
+        count = self._prompt_cache_count
+        
+        embs = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        embs[:count] = self._prompt_cache_embs[:count]
+        used = np.zeros(capacity, dtype=np.int64)
+        used[:count] = self._prompt_cache_used[:count]
+        self._prompt_cache_embs, self._prompt_cache_used = embs, used
+
+    def lookup_prompt_cache(self, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Return the cached response for the most similar context, if similar enough"""
+        if self._prompt_cache_count == 0:
+            return None
+        
+        # Rows and query are unit vectors, so the dot product is the cosine similarity
+        similarities = self._prompt_cache_embs[:self._prompt_cache_count] @ embedding
+        best = int(similarities.argmax())
+        if similarities[best] < self.PROMPT_CACHE_THRESHOLD:
             return None
+        
+        self._prompt_cache_tick += 1
+        self._prompt_cache_used[best] = self._prompt_cache_tick
+        return self._prompt_cache_vals[best]
 
-    async def generate_refresh_prompt(self, traffic_drop: TrafficDrop, content_analysis: ContentAnalysis) -> RefreshPrompt:
-        """Generate a refresh prompt using AI"""
+    async def save_to_prompt_cache(self, embedding: np.ndarray, response: Dict[str, Any]):
+        """Cache a new response in memory and persist it for later runs"""
+        self.add_to_prompt_cache(embedding, response)
+        
         try:
-            # Prepare context for AI
-            context = f"""
+            pool = await self.get_db_pool()
+            await pool.execute(
+                INSERT_PROMPT_CACHE_SQL,
+                orjson.dumps(embedding, option=orjson.OPT_SERIALIZE_NUMPY).decode(),
+                orjson.dumps(response).decode()
+            )
+        except Exception:
+            logger.exception("Error saving refresh prompt cache entry")
+
+    def build_prompt_messages(self, context: str) -> List[Dict[str, str]]:
+        """Build the OpenAI chat messages asking for a refresh prompt for a post context"""
+        return [
+            {
+                "role": "system",
+                "content": REFRESH_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"""
+                Analyze this post that has experienced a traffic drop and generate a refresh prompt:
+                
+                {context}
+                
+                Please provide:
+                1. A clear title for the refresh prompt
+                2. A description of why the content needs refreshing
+                3. 3-5 specific, actionable suggestions for improving the content
+                4. Priority level (low/medium/high/urgent) based on the traffic drop severity
+                
+                Format as JSON:
+                {{
+                    "title": "string",
+                    "description": "string",
+                    "suggested_actions": ["action1", "action2", "action3"],
+                    "priority": "low|medium|high|urgent"
+                }}
+                """
+            }
+        ]
+
+    async def request_refresh_prompt(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Ask OpenAI for a refresh prompt (title, description, actions)"""
+        response = await self.openai_client.chat.completions.create(
+            model=REFRESH_PROMPT_MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=REFRESH_PROMPT_MAX_TOKENS,
+            response_format={"type": "json_object"}
+        )
+        
+        # Parse AI response
+        return orjson.loads(response.choices[0].message.content)
+
+    async def fetch_llm_cache(self, keys: List[bytes]) -> Dict[bytes, Dict[str, Any]]:
+        """Get cached OpenAI responses for exact request keys, in one query"""
+        if not keys:
+            return {}
+        
+        try:
+            pool = await self.get_db_pool()
+            rows = await pool.fetch(FETCH_LLM_CACHE_SQL, keys)
+            return {bytes(row['key']): orjson.loads(row['response']) for row in rows}
+        except Exception:
+            logger.exception("Error reading LLM cache")
+            return {}
+
+    async def save_to_llm_cache(self, key: bytes, response: Dict[str, Any]):
+        """Persist an OpenAI response under its exact request key"""
+        try:
+            pool = await self.get_db_pool()
+            await pool.execute(INSERT_LLM_CACHE_SQL, key, orjson.dumps(response).decode())
+        except Exception:
+            logger.exception("Error saving LLM cache entry")
+
+    def build_prompt_context(self, traffic_drop: TrafficDrop, content_analysis: ContentAnalysis) -> str:
+        """Describe a traffic drop for the refresh prompt request"""
+        return f"""
             Post Title: {traffic_drop.post_title}
             Traffic Drop: {traffic_drop.drop_percentage:.1%}
             Days Since Published: {traffic_drop.days_since_published}
@@ -226,44 +540,75 @@ class RefreshWorker:
             Content Freshness Score: {content_analysis.content_freshness_score:.2f}
             Overall Refresh Score: {content_analysis.overall_refresh_score:.2f}
             """
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as unit vectors in one batched encode, in input order"""
+        if not texts:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        
+        # Similar lengths share a batch, so little of each batch is padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_embeddings = await asyncio.to_thread(
+            self.model.encode,
+            [texts[i] for i in order],
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+
+    def describe_traffic_drop(self, traffic_drop: TrafficDrop) -> Tuple[str, str]:
+        """Refresh prompt title and description built from the post's own traffic drop"""
+        return (
+            f"Content Refresh Needed: {traffic_drop.post_title}",
+            f"This post has experienced a {traffic_drop.drop_percentage:.1%} traffic drop and may need refreshing."
+        )
+
+    async def generate_refresh_prompt(self, traffic_drop: TrafficDrop, content_analysis: ContentAnalysis,
+                                      embedding: Optional[np.ndarray] = None,
+                                      cached_response: Optional[Dict[str, Any]] = None,
+                                      now: Optional[datetime] = None) -> RefreshPrompt:
+        """Generate a refresh prompt using AI
+
+        run_refresh_analysis passes either the exact-cache hit or the
+        context's precomputed unit embedding. When neither is given, both
+        caches are checked here.
+        """
+        now = now or datetime.now(timezone.utc)
+        
+        try:
+            # Prepare context for AI
+            context = self.build_prompt_context(traffic_drop, content_analysis)
+            messages = self.build_prompt_messages(context)
+            cache_key = llm_cache_key(REFRESH_PROMPT_MODEL, messages)
             
-            # Generate prompt using OpenAI
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a content marketing expert. Analyze the given post data and generate a refresh prompt with specific, actionable suggestions."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"""
-                        Analyze this post that has experienced a traffic drop and generate a refresh prompt:
-                        
-                        {context}
-                        
-                        Please provide:
-                        1. A clear title for the refresh prompt
-                        2. A description of why the content needs refreshing
-                        3. 3-5 specific, actionable suggestions for improving the content
-                        4. Priority level (low/medium/high/urgent) based on the traffic drop severity
-                        
-                        Format as JSON:
-                        {{
-                            "title": "string",
-                            "description": "string",
-                            "suggested_actions": ["action1", "action2", "action3"],
-                            "priority": "low|medium|high|urgent"
-                        }}
-                        """
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
+            # An exact repeat of an earlier request reuses its response as-is
+            if cached_response is None and embedding is None:
+                cached_response = (await self.fetch_llm_cache([cache_key])).get(cache_key)
+            ai_response = cached_response
             
-            # Parse AI response
-            ai_response = json.loads(response.choices[0].message.content)
+            if ai_response is None:
+                # Reuse the response for a near-identical context from this or an earlier run
+                await self.load_prompt_cache()
+                if embedding is None:
+                    embedding = (await self.embed_texts([context]))[0]
+                similar_response = self.lookup_prompt_cache(embedding)
+                if similar_response is not None:
+                    # Its title and description were written about another post;
+                    # only the post-agnostic actions carry over
+                    title, description = self.describe_traffic_drop(traffic_drop)
+                    ai_response = {
+                        'title': title,
+                        'description': description,
+                        'suggested_actions': similar_response['suggested_actions']
+                    }
+                else:
+                    ai_response = await self.request_refresh_prompt(messages)
+                    await self.save_to_llm_cache(cache_key, ai_response)
+                    await self.save_to_prompt_cache(embedding, ai_response)
             
             # Determine priority based on traffic drop severity
             priority_mapping = {
@@ -282,18 +627,19 @@ class RefreshWorker:
                 description=ai_response['description'],
                 suggested_actions=ai_response['suggested_actions'],
                 priority=priority,
-                created_at=datetime.now(),
+                created_at=now,
                 status='pending'
             )
             
-        except Exception as e:
-            print(f"Error generating refresh prompt for post {traffic_drop.post_id}: {e}")
+        except Exception:
+            logger.exception("Error generating refresh prompt for post %s", traffic_drop.post_id)
             # Fallback prompt
+            title, description = self.describe_traffic_drop(traffic_drop)
             return RefreshPrompt(
                 post_id=traffic_drop.post_id,
                 prompt_type='traffic_drop',
-                title=f"Content Refresh Needed: {traffic_drop.post_title}",
-                description=f"This post has experienced a {traffic_drop.drop_percentage:.1%} traffic drop and may need refreshing.",
+                title=title,
+                description=description,
                 suggested_actions=[
                     "Update statistics and data",
                     "Add recent examples and case studies",
@@ -302,106 +648,122 @@ class RefreshWorker:
                     "Update meta description and title"
                 ],
                 priority='medium',
-                created_at=datetime.now(),
+                created_at=now,
                 status='pending'
             )
 
-    async def save_refresh_prompt(self, prompt: RefreshPrompt):
-        """Save refresh prompt to database"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute("""
-                    INSERT INTO refresh_prompts (
-                        post_id, prompt_type, title, description, suggested_actions,
-                        priority, status, created_at, updated_at
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    )
-                """, (
-                    prompt.post_id,
-                    prompt.prompt_type,
-                    prompt.title,
-                    prompt.description,
-                    json.dumps(prompt.suggested_actions),
-                    prompt.priority,
-                    prompt.status,
-                    prompt.created_at,
-                    datetime.now()
-                ))
-                
-                await conn.commit()
-
-    async def save_content_analysis(self, analysis: ContentAnalysis):
-        """Save content analysis to database"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor() as cur:
-                await cur.execute("""
-                    INSERT INTO content_analyses (
-                        post_id, content_freshness_score, keyword_relevance_score,
-                        competitor_gap_score, seo_opportunity_score, overall_refresh_score,
-                        analysis_date, created_at, updated_at
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    ) ON CONFLICT (post_id) 
-                    DO UPDATE SET 
-                        content_freshness_score = EXCLUDED.content_freshness_score,
-                        keyword_relevance_score = EXCLUDED.keyword_relevance_score,
-                        competitor_gap_score = EXCLUDED.competitor_gap_score,
-                        seo_opportunity_score = EXCLUDED.seo_opportunity_score,
-                        overall_refresh_score = EXCLUDED.overall_refresh_score,
-                        analysis_date = EXCLUDED.analysis_date,
-                        updated_at = EXCLUDED.updated_at
-                """, (
-                    analysis.post_id,
-                    analysis.content_freshness_score,
-                    analysis.keyword_relevance_score,
-                    analysis.competitor_gap_score,
-                    analysis.seo_opportunity_score,
-                    analysis.overall_refresh_score,
-                    analysis.analysis_date,
-                    datetime.now(),
-                    datetime.now()
-                ))
-                
-                await conn.commit()
+    async def save_refresh_results(self, analyses: List[ContentAnalysis], prompts: List[RefreshPrompt],
+                                   now: datetime):
+        """Save a run's content analyses and refresh prompts in one transaction"""
+        
+        analysis_rows = [
+            (
+                analysis.post_id,
+                analysis.content_freshness_score,
+                analysis.keyword_relevance_score,
+                analysis.competitor_gap_score,
+                analysis.seo_opportunity_score,
+                analysis.overall_refresh_score,
+                analysis.analysis_date,
+                now,
+                now
+            )
+            for analysis in analyses
+        ]
+        
+        prompt_rows = [
+            (
+                prompt.post_id,
+                prompt.prompt_type,
+                prompt.title,
+                prompt.description,
+                orjson.dumps(prompt.suggested_actions).decode(),
+                prompt.priority,
+                prompt.status,
+                prompt.created_at,
+                now
+            )
+            for prompt in prompts
+        ]
+        
+        pool = await self.get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if analysis_rows:
+                    await conn.executemany(INSERT_ANALYSIS_SQL, analysis_rows)
+                if prompt_rows:
+                    await conn.executemany(INSERT_PROMPT_SQL, prompt_rows)
+
+    async def process_traffic_drop(self, semaphore: asyncio.Semaphore, traffic_drop: TrafficDrop,
+                                   content_analysis: Optional[ContentAnalysis],
+                                   embedding: Optional[np.ndarray],
+                                   cached_response: Optional[Dict[str, Any]],
+                                   now: datetime) -> RefreshPrompt:
+        """Generate the refresh prompt for one traffic drop while holding the semaphore"""
+        async with semaphore:
+            refresh_prompt = await self.generate_refresh_prompt(
+                traffic_drop, content_analysis, embedding, cached_response, now
+            )
+            
+            logger.debug("Generated refresh prompt for post: %s", traffic_drop.post_title)
+            return refresh_prompt
 
     async def run_refresh_analysis(self) -> List[RefreshPrompt]:
         """Main function to run refresh analysis"""
         try:
-            print("Starting refresh analysis...")
+            logger.info("Starting refresh analysis...")
             
-            # Detect traffic drops
-            traffic_drops = await self.detect_traffic_drops()
-            print(f"Detected {len(traffic_drops)} traffic drops")
+            # One timestamp for every record this run creates
+            now = datetime.now(timezone.utc)
             
-            # Get posts for analysis
-            posts = await self.get_published_posts_with_analytics()
+            # Detect traffic drops; the same rows carry the posts for analysis
+            posts = await self.get_traffic_drop_candidates()
             posts_dict = {post['id']: post for post in posts}
+            traffic_drops = self.detect_traffic_drops(posts)
+            logger.info("Detected %d traffic drops", len(traffic_drops))
             
-            refresh_prompts = []
+            # Analyze content freshness
+            analyses = [
+                await self.analyze_content_freshness(posts_dict[traffic_drop.post_id], now)
+                for traffic_drop in traffic_drops
+            ]
             
-            # Analyze each traffic drop
-            for traffic_drop in traffic_drops:
-                if traffic_drop.post_id in posts_dict:
-                    post = posts_dict[traffic_drop.post_id]
-                    
-                    # Analyze content freshness
-                    content_analysis = await self.analyze_content_freshness(post)
-                    if content_analysis:
-                        await self.save_content_analysis(content_analysis)
-                    
-                    # Generate refresh prompt
-                    refresh_prompt = await self.generate_refresh_prompt(traffic_drop, content_analysis)
-                    await self.save_refresh_prompt(refresh_prompt)
-                    refresh_prompts.append(refresh_prompt)
-                    
-                    print(f"Generated refresh prompt for post: {traffic_drop.post_title}")
+            # Look up every prompt request in the exact cache in one query
+            analyzed = [i for i, analysis in enumerate(analyses) if analysis]
+            contexts = {i: self.build_prompt_context(traffic_drops[i], analyses[i]) for i in analyzed}
+            cache_keys = {
+                i: llm_cache_key(REFRESH_PROMPT_MODEL, self.build_prompt_messages(context))
+                for i, context in contexts.items()
+            }
+            cached = await self.fetch_llm_cache(list(set(cache_keys.values())))
+            cached_responses = [cached.get(cache_keys.get(i)) for i in range(len(traffic_drops))]
+            
+            # Embed the remaining prompt contexts in a single batched encode
+            uncached = [i for i in analyzed if cached_responses[i] is None]
+            context_embeddings = await self.embed_texts([contexts[i] for i in uncached])
+            embeddings: List[Optional[np.ndarray]] = [None] * len(traffic_drops)
+            for i, embedding in zip(uncached, context_embeddings):
+                embeddings[i] = embedding
+            
+            # Generate refresh prompts concurrently; the OpenAI call dominates
+            semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_DROPS)
+            refresh_prompts = await asyncio.gather(*[
+                self.process_traffic_drop(
+                    semaphore, traffic_drops[i], analyses[i], embeddings[i], cached_responses[i], now
+                )
+                for i in range(len(traffic_drops))
+            ])
             
-            print(f"Generated {len(refresh_prompts)} refresh prompts")
+            content_analyses = [analysis for analysis in analyses if analysis]
+            
+            # Save everything in one round-trip per table
+            await self.save_refresh_results(content_analyses, refresh_prompts, now)
+            
+            logger.info("Generated %d refresh prompts", len(refresh_prompts))
             return refresh_prompts
             
-        except Exception as e:
-            print(f"Error in refresh analysis: {e}")
+        except Exception:
+            logger.exception("Error in refresh analysis")
             return []
 
     async def process_refresh_request(self) -> Dict[str, Any]:
@@ -422,23 +784,26 @@ class RefreshWorker:
                     }
                     for prompt in refresh_prompts
                 ],
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now(timezone.utc).isoformat()
             }
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now(timezone.utc).isoformat()
             }
 
 async def main():
     """Test the refresh worker"""
     worker = RefreshWorker()
     
-    # Test refresh analysis
-    result = await worker.process_refresh_request()
-    print("Refresh Analysis Result:")
-    print(json.dumps(result, indent=2, default=str))
+    try:
+        # Test refresh analysis
+        result = await worker.process_refresh_request()
+        print("Refresh Analysis Result:")
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY).decode())
+    finally:
+        await worker.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
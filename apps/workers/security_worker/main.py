@@ -11,29 +11,133 @@ Handles:
 """
 
 import os
-import json
 import asyncio
 import logging
-import subprocess
+import time
 import tempfile
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 import hashlib
 import hmac
 import base64
 import urllib.parse
+import sqlite3
+from bisect import bisect_right
+from collections import Counter
+from contextlib import closing, contextmanager
 
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import aiohttp
+import ijson
+import orjson
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 import redis
-import requests
 from packaging import version
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+NVD_API_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+# Matches per package, the same page size the live keyword search uses
+NVD_RESULTS_PER_KEYWORD = 20
+# Largest page NVD serves; the API rejects lastMod ranges over 120 days
+NVD_SYNC_PAGE_SIZE = 2000
+NVD_SYNC_MAX_RANGE = timedelta(days=120)
+
+# In-process memo of keyword lookups: entries per worker and bucket length in seconds
+NVD_MEMO_SIZE = 4096
+NVD_MEMO_TTL = 3600
+
+# Body cached for failed NVD lookups, and how long it is kept
+NVD_EMPTY_RESPONSE = '{"vulnerabilities": []}'
+NVD_NEGATIVE_CACHE_TTL = 300
+
+def to_json(value: Any) -> str:
+    """Serialize a value for a JSON database column"""
+    return orjson.dumps(value).decode()
+
+# CVSS v3 score bands: below 4.0 is low, 4.0+ medium, 7.0+ high, 9.0+ critical
+CVSS_BREAKPOINTS = (4.0, 7.0, 9.0)
+CVSS_SEVERITIES = ('low', 'medium', 'high', 'critical')
+
+def cvss_base_score(cve: Dict[str, Any]) -> float:
+    """CVSS v3.1 (or v3.0) base score of an NVD CVE record, 0.0 if unscored"""
+    metrics = cve.get('metrics', {})
+    for key in ('cvssMetricV31', 'cvssMetricV30'):
+        if key in metrics:
+            return float(metrics[key][0]['cvssData']['baseScore'])
+    return 0.0
+
+# Local NVD mirror: one row per CVE, full-text indexed on affected products
+# (from CPE matches) and the English description
+NVD_MIRROR_SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS cve (
+    id TEXT PRIMARY KEY,
+    packages TEXT NOT NULL,
+    description TEXT NOT NULL,
+    cvss REAL NOT NULL,
+    severity TEXT NOT NULL,
+    published TEXT,
+    last_modified TEXT,
+    raw TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS cve_fts USING fts5(
+    packages, description, content='cve', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS cve_ai AFTER INSERT ON cve BEGIN
+    INSERT INTO cve_fts (rowid, packages, description)
+    VALUES (new.rowid, new.packages, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS cve_au AFTER UPDATE ON cve BEGIN
+    INSERT INTO cve_fts (cve_fts, rowid, packages, description)
+    VALUES ('delete', old.rowid, old.packages, old.description);
+    INSERT INTO cve_fts (rowid, packages, description)
+    VALUES (new.rowid, new.packages, new.description);
+END;
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UPSERT_MIRROR_CVE_SQL = """
+INSERT INTO cve (id, packages, description, cvss, severity, published, last_modified, raw)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    packages = excluded.packages,
+    description = excluded.description,
+    cvss = excluded.cvss,
+    severity = excluded.severity,
+    last_modified = excluded.last_modified,
+    raw = excluded.raw
+"""
+
+LAST_SYNC_SQL = "SELECT value FROM sync_state WHERE key = 'last_sync'"
+
+SEARCH_MIRROR_SQL = """
+SELECT cve.raw
+FROM cve_fts JOIN cve ON cve.rowid = cve_fts.rowid
+WHERE cve_fts MATCH ?
+ORDER BY rank
+LIMIT ?
+"""
+
+# Seconds between writes of Redis-admitted signed URL accesses to Postgres
+SIGNED_URL_FLUSH_INTERVAL = 1.0
+
+# Decrement a signed URL's remaining uses, or return nil if it isn't cached
+SIGNED_URL_DECR_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+return redis.call('DECR', KEYS[1])
+"""
+
 @dataclass
 class Vulnerability:
     """Represents a security vulnerability"""
@@ -119,17 +223,83 @@ class SecurityWorker:
             db=0,
             decode_responses=True
         )
+        self._decr_signed_url = self.redis_client.register_script(SIGNED_URL_DECR_SCRIPT)
         
         self.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
+        # Keyed once; copies skip re-deriving the inner/outer pads per signature
+        self._hmac_template = hmac.new(self.secret_key.encode(), digestmod=hashlib.sha256)
         self.base_url = os.getenv('BASE_URL', 'https://storage.example.com')
         
         # Security scan APIs
         self.nvd_api_key = os.getenv('NVD_API_KEY')
+        # NVD allows 5 requests per 30s without an API key
+        self.nvd_concurrency = int(os.getenv('NVD_CONCURRENCY', '5'))
+        self.nvd_cache_ttl = int(os.getenv('NVD_CACHE_TTL', '21600'))
+        self.nvd_mirror_path = os.getenv('NVD_MIRROR_PATH', 'db/nvd_cache.sqlite')
+        self._nvd_memo: Dict[tuple, asyncio.Future] = {}
         self.trivy_path = os.getenv('TRIVY_PATH', 'trivy')
+        self.trivy_server = os.getenv('TRIVY_SERVER_URL')
+        self.trivy_cache_dir = os.getenv('TRIVY_CACHE_DIR', '/var/cache/trivy')
+        
+        self.db_pool: Optional[ThreadedConnectionPool] = None
+        # DB calls run in worker threads, so the pool is created under a lock
+        self._db_pool_lock = threading.Lock()
+        self.http: Optional[aiohttp.ClientSession] = None
         
+        # Signed URL accesses admitted by Redis, waiting to be written to Postgres
+        self._dirty_urls: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        
+    @staticmethod
+    def _id(prefix: str, *parts: str) -> str:
+        """Build a stable record id from a 128-bit BLAKE2b digest of its parts"""
+        digest = hashlib.blake2b(':'.join(parts).encode(), digest_size=16).hexdigest()
+        return f"{prefix}_{digest}"
+    
+    def _sign(self, data: str) -> str:
+        """HMAC-SHA256 signature of data under the worker's secret key"""
+        mac = self._hmac_template.copy()
+        mac.update(data.encode())
+        # Unpadded URL-safe base64: 43 characters and nothing to escape
+        return base64.urlsafe_b64encode(mac.digest()).rstrip(b'=').decode()
+    
+    @contextmanager
     def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_config)
+        """Borrow a pooled database connection for one transaction"""
+        if self.db_pool is None:
+            with self._db_pool_lock:
+                if self.db_pool is None:
+                    self.db_pool = ThreadedConnectionPool(2, 20, **self.db_config)
+        pool = self.db_pool
+        conn = pool.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            pool.putconn(conn)
+    
+    def get_http_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use"""
+        if self.http is None or self.http.closed:
+            self.http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=30),
+                headers={'apiKey': self.nvd_api_key} if self.nvd_api_key else None
+            )
+        return self.http
+    
+    async def close(self):
+        """Flush pending access counts, then close the shared HTTP session and database pool"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush_signed_url_accesses()
+        if self.http is not None and not self.http.closed:
+            await self.http.close()
+        self.http = None
+        if self.db_pool is not None:
+            self.db_pool.closeall()
+            self.db_pool = None
     
     async def scan_dependencies(self, project_path: str, include_dev: bool = False) -> SecurityScan:
         """
@@ -154,34 +324,38 @@ class SecurityWorker:
                 raise FileNotFoundError("package.json not found")
             
             # Read package.json
-            with open(package_json_path, 'r') as f:
-                package_data = json.load(f)
+            with open(package_json_path, 'rb') as f:
+                package_data = orjson.loads(f.read())
             
             dependencies = {}
             if include_dev:
                 dependencies.update(package_data.get('devDependencies', {}))
             dependencies.update(package_data.get('dependencies', {}))
             
+            # Look up all packages concurrently, bounded so NVD isn't flooded
+            semaphore = asyncio.Semaphore(self.nvd_concurrency)
+            
+            async def check_package(package_name: str, package_version: str) -> List[Vulnerability]:
+                async with semaphore:
+                    return await self._check_package_vulnerabilities(package_name, package_version)
+            
+            results = await asyncio.gather(
+                *[check_package(name, ver) for name, ver in dependencies.items()],
+                return_exceptions=True
+            )
+            
             vulnerabilities = []
-            critical_count = 0
-            high_count = 0
-            medium_count = 0
-            low_count = 0
-            
-            # Check each dependency for vulnerabilities
-            for package_name, package_version in dependencies.items():
-                package_vulns = await self._check_package_vulnerabilities(package_name, package_version)
+            for package_name, package_vulns in zip(dependencies, results):
+                if isinstance(package_vulns, BaseException):
+                    logger.error(f"Error checking vulnerabilities for {package_name}: {str(package_vulns)}")
+                    continue
                 vulnerabilities.extend(package_vulns)
-                
-                for vuln in package_vulns:
-                    if vuln.severity == 'critical':
-                        critical_count += 1
-                    elif vuln.severity == 'high':
-                        high_count += 1
-                    elif vuln.severity == 'medium':
-                        medium_count += 1
-                    elif vuln.severity == 'low':
-                        low_count += 1
+            
+            severity_counts = Counter(vuln.severity for vuln in vulnerabilities)
+            critical_count = severity_counts['critical']
+            high_count = severity_counts['high']
+            medium_count = severity_counts['medium']
+            low_count = severity_counts['low']
             
             completed_at = datetime.now().isoformat()
             
@@ -207,8 +381,7 @@ class SecurityWorker:
             await self._save_security_scan(scan)
             
             # Save vulnerabilities to database
-            for vuln in vulnerabilities:
-                await self._save_vulnerability(vuln)
+            await self._save_vulnerabilities_bulk(vulnerabilities)
             
             logger.info(f"Dependency scan completed: {scan.results_summary}")
             return scan
@@ -250,61 +423,81 @@ class SecurityWorker:
             # Use Trivy to scan the image
             full_image_name = f"{registry}/{image_name}"
             
-            # Run Trivy scan
-            result = subprocess.run([
-                self.trivy_path,
+            vulnerabilities = []
+            
+            # Run Trivy scan, parsing findings as they stream out of stdout
+            # instead of loading the whole report
+            trivy_args = [
                 'image',
+                '--quiet',
                 '--format', 'json',
-                '--severity', 'CRITICAL,HIGH,MEDIUM,LOW',
-                full_image_name
-            ], capture_output=True, text=True, timeout=300)
+                '--severity', 'CRITICAL,HIGH,MEDIUM,LOW'
+            ]
+            if self.trivy_server:
+                # Let the long-running Trivy server do the scan against its
+                # in-memory vulnerability DB
+                trivy_args += ['--server', self.trivy_server]
             
-            if result.returncode != 0:
-                raise Exception(f"Trivy scan failed: {result.stderr}")
+            proc = await asyncio.create_subprocess_exec(
+                self.trivy_path,
+                *trivy_args,
+                full_image_name,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                # Keep the DB between standalone scans instead of re-downloading it
+                env={**os.environ, 'TRIVY_CACHE_DIR': self.trivy_cache_dir}
+            )
+            stderr_task = asyncio.create_task(proc.stderr.read())
             
-            # Parse Trivy results
-            trivy_results = json.loads(result.stdout)
+            try:
+                async with asyncio.timeout(300):
+                    # Process vulnerabilities from Trivy
+                    async for vuln in ijson.items_async(proc.stdout, 'Results.item.Vulnerabilities.item', use_float=True):
+                        severity = vuln.get('Severity', 'UNKNOWN').lower()
+                        
+                        # Create vulnerability object
+                        vulnerability = Vulnerability(
+                            id=self._id('vuln', vuln.get('VulnerabilityID', ''), vuln.get('PkgName', '')),
+                            package_name=vuln.get('PkgName', ''),
+                            package_version=vuln.get('InstalledVersion', ''),
+                            vulnerability_id=vuln.get('VulnerabilityID', ''),
+                            severity=severity,
+                            title=vuln.get('Title', ''),
+                            description=vuln.get('Description', ''),
+                            cve_id=vuln.get('VulnerabilityID'),
+                            cvss_score=float(vuln.get('CVSS', {}).get('nvd', {}).get('V3Score', 0)),
+                            affected_versions=[vuln.get('InstalledVersion', '')],
+                            fixed_versions=[vuln.get('FixedVersion', '')] if vuln.get('FixedVersion') else [],
+                            published_date=datetime.now().isoformat(),
+                            last_updated=datetime.now().isoformat(),
+                            status='open',
+                            remediation=f"Update to version {vuln.get('FixedVersion', 'latest')}" if vuln.get('FixedVersion') else "No fix available",
+                            references=vuln.get('References', [])
+                        )
+                        vulnerabilities.append(vulnerability)
+                        
+                    await proc.wait()
+            except ijson.JSONError:
+                # A failed scan leaves stdout empty; report Trivy's own error
+                await proc.wait()
+                if proc.returncode == 0:
+                    raise
+            except BaseException:
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+            finally:
+                stderr = (await stderr_task).decode(errors='replace')
             
-            vulnerabilities = []
-            critical_count = 0
-            high_count = 0
-            medium_count = 0
-            low_count = 0
-            
-            # Process vulnerabilities from Trivy
-            for result_data in trivy_results.get('Results', []):
-                for vuln in result_data.get('Vulnerabilities', []):
-                    severity = vuln.get('Severity', 'UNKNOWN').lower()
-                    
-                    if severity == 'critical':
-                        critical_count += 1
-                    elif severity == 'high':
-                        high_count += 1
-                    elif severity == 'medium':
-                        medium_count += 1
-                    elif severity == 'low':
-                        low_count += 1
-                    
-                    # Create vulnerability object
-                    vulnerability = Vulnerability(
-                        id=f"vuln_{hashlib.md5(f"{vuln.get('VulnerabilityID', '')}{vuln.get('PkgName', '')}".encode()).hexdigest()}",
-                        package_name=vuln.get('PkgName', ''),
-                        package_version=vuln.get('InstalledVersion', ''),
-                        vulnerability_id=vuln.get('VulnerabilityID', ''),
-                        severity=severity,
-                        title=vuln.get('Title', ''),
-                        description=vuln.get('Description', ''),
-                        cve_id=vuln.get('VulnerabilityID'),
-                        cvss_score=float(vuln.get('CVSS', {}).get('nvd', {}).get('V3Score', 0)),
-                        affected_versions=[vuln.get('InstalledVersion', '')],
-                        fixed_versions=[vuln.get('FixedVersion', '')] if vuln.get('FixedVersion') else [],
-                        published_date=datetime.now().isoformat(),
-                        last_updated=datetime.now().isoformat(),
-                        status='open',
-                        remediation=f"Update to version {vuln.get('FixedVersion', 'latest')}" if vuln.get('FixedVersion') else "No fix available",
-                        references=vuln.get('References', [])
-                    )
-                    vulnerabilities.append(vulnerability)
+            if proc.returncode != 0:
+                raise Exception(f"Trivy scan failed: {stderr}")
+            
+            severity_counts = Counter(vuln.severity for vuln in vulnerabilities)
+            critical_count = severity_counts['critical']
+            high_count = severity_counts['high']
+            medium_count = severity_counts['medium']
+            low_count = severity_counts['low']
             
             completed_at = datetime.now().isoformat()
             
@@ -321,7 +514,8 @@ class SecurityWorker:
                 low_count=low_count,
                 scan_config={
                     'image_name': image_name,
-                    'registry': registry
+                    'registry': registry,
+                    'trivy_server': self.trivy_server
                 },
                 results_summary=f"Found {len(vulnerabilities)} vulnerabilities: {critical_count} critical, {high_count} high, {medium_count} medium, {low_count} low"
             )
@@ -330,8 +524,7 @@ class SecurityWorker:
             await self._save_security_scan(scan)
             
             # Save vulnerabilities to database
-            for vuln in vulnerabilities:
-                await self._save_vulnerability(vuln)
+            await self._save_vulnerabilities_bulk(vulnerabilities)
             
             logger.info(f"Container scan completed: {scan.results_summary}")
             return scan
@@ -353,6 +546,25 @@ class SecurityWorker:
                 results_summary=f"Scan failed: {str(e)}"
             )
     
+    async def scan_all(self, project_path: str, image_name: str,
+                       registry: str = 'docker.io') -> List[SecurityScan]:
+        """
+        Run the dependency and container scans concurrently
+        
+        Args:
+            project_path: Path to the project directory
+            image_name: Name of the container image
+            registry: Container registry
+            
+        Returns:
+            Dependency scan and container scan results, in that order
+        """
+        dep_scan, image_scan = await asyncio.gather(
+            self.scan_dependencies(project_path),
+            self.scan_container_image(image_name, registry)
+        )
+        return [dep_scan, image_scan]
+    
     async def _check_package_vulnerabilities(self, package_name: str, package_version: str) -> List[Vulnerability]:
         """
         Check a specific package for vulnerabilities using NVD API
@@ -367,23 +579,7 @@ class SecurityWorker:
         vulnerabilities = []
         
         try:
-            # Query NVD API for vulnerabilities
-            if self.nvd_api_key:
-                headers = {'apiKey': self.nvd_api_key}
-            else:
-                headers = {}
-            
-            # Search for vulnerabilities related to this package
-            url = f"https://services.nvd.nist.gov/rest/json/cves/2.0"
-            params = {
-                'keyword': package_name,
-                'resultsPerPage': 20
-            }
-            
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = await self._fetch_nvd_keyword(package_name)
             
             for vuln_data in data.get('vulnerabilities', []):
                 cve = vuln_data.get('cve', {})
@@ -391,21 +587,10 @@ class SecurityWorker:
                 # Check if this vulnerability affects our package version
                 if self._is_version_affected(package_version, cve):
                     # Parse CVSS score
-                    cvss_score = 0.0
-                    if 'metrics' in cve and 'cvssMetricV31' in cve['metrics']:
-                        cvss_score = float(cve['metrics']['cvssMetricV31'][0]['cvssData']['baseScore'])
-                    elif 'metrics' in cve and 'cvssMetricV30' in cve['metrics']:
-                        cvss_score = float(cve['metrics']['cvssMetricV30'][0]['cvssData']['baseScore'])
+                    cvss_score = cvss_base_score(cve)
                     
                     # Determine severity based on CVSS score
-                    if cvss_score >= 9.0:
-                        severity = 'critical'
-                    elif cvss_score >= 7.0:
-                        severity = 'high'
-                    elif cvss_score >= 4.0:
-                        severity = 'medium'
-                    else:
-                        severity = 'low'
+                    severity = CVSS_SEVERITIES[bisect_right(CVSS_BREAKPOINTS, cvss_score)]
                     
                     vulnerability = Vulnerability(
                         id=f"vuln_{cve.get('id', '')}",
@@ -432,6 +617,178 @@ class SecurityWorker:
         
         return vulnerabilities
     
+    async def _fetch_nvd_keyword(self, package_name: str) -> Dict[str, Any]:
+        """Fetch NVD keyword search results, sharing one lookup per package per hour"""
+        memo_key = (package_name, int(time.time() // NVD_MEMO_TTL))
+        lookup = self._nvd_memo.get(memo_key)
+        if lookup is None:
+            lookup = asyncio.ensure_future(self._load_nvd_keyword(package_name))
+            self._nvd_memo[memo_key] = lookup
+            if len(self._nvd_memo) > NVD_MEMO_SIZE:
+                del self._nvd_memo[next(iter(self._nvd_memo))]
+            
+            def forget_failed(done: asyncio.Future):
+                if (done.cancelled() or done.exception() is not None) and self._nvd_memo.get(memo_key) is done:
+                    del self._nvd_memo[memo_key]
+            
+            lookup.add_done_callback(forget_failed)
+        # Shielded so one cancelled scan doesn't cancel the lookup for the rest
+        return await asyncio.shield(lookup)
+    
+    async def _load_nvd_keyword(self, package_name: str) -> Dict[str, Any]:
+        """Load NVD keyword search results from the local mirror, else NVD via Redis"""
+        mirrored = await asyncio.to_thread(self._search_nvd_mirror, package_name)
+        if mirrored is not None:
+            return mirrored
+        
+        cache_key = f"nvd:kw:{package_name}"
+        try:
+            cached = self.redis_client.get(cache_key)
+        except redis.RedisError as e:
+            logger.warning(f"NVD cache read failed for {package_name}: {str(e)}")
+            cached = None
+        if cached is not None:
+            return orjson.loads(cached)
+        
+        params = {
+            'keyword': package_name,
+            'resultsPerPage': NVD_RESULTS_PER_KEYWORD
+        }
+        
+        try:
+            async with self.get_http_session().get(NVD_API_URL, params=params) as response:
+                response.raise_for_status()
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            # Remember the failure briefly so repeat scans don't hammer NVD
+            self._cache_nvd_response(cache_key, NVD_EMPTY_RESPONSE, NVD_NEGATIVE_CACHE_TTL)
+            raise
+        
+        self._cache_nvd_response(cache_key, text, self.nvd_cache_ttl)
+        return orjson.loads(text)
+    
+    def _cache_nvd_response(self, cache_key: str, text: str, ttl: int):
+        """Store a raw NVD response body in Redis"""
+        try:
+            self.redis_client.set(cache_key, text, ex=ttl)
+        except redis.RedisError as e:
+            logger.warning(f"NVD cache write failed for {cache_key}: {str(e)}")
+    
+    async def sync_nvd(self) -> int:
+        """
+        Mirror the NVD CVE feed into the local SQLite database
+        
+        The first run pages through the whole feed; later runs only fetch
+        CVEs modified since the previous sync.
+        
+        Returns:
+            Number of CVEs written
+        """
+        sync_started = datetime.now(timezone.utc)
+        last_sync = await asyncio.to_thread(self._nvd_mirror_last_sync)
+        
+        params: Dict[str, Any] = {'resultsPerPage': NVD_SYNC_PAGE_SIZE}
+        if last_sync is not None and sync_started - last_sync < NVD_SYNC_MAX_RANGE:
+            params['lastModStartDate'] = last_sync.strftime('%Y-%m-%dT%H:%M:%S.000')
+            params['lastModEndDate'] = sync_started.strftime('%Y-%m-%dT%H:%M:%S.000')
+        
+        # Stay under NVD's rolling 30s request window
+        page_delay = 0.6 if self.nvd_api_key else 6.0
+        start_index = 0
+        written = 0
+        
+        while True:
+            async with self.get_http_session().get(
+                NVD_API_URL,
+                params={**params, 'startIndex': start_index},
+                timeout=aiohttp.ClientTimeout(total=300)
+            ) as response:
+                response.raise_for_status()
+                page = await response.json(loads=orjson.loads)
+            
+            cves = [item['cve'] for item in page.get('vulnerabilities', [])]
+            written += await asyncio.to_thread(self._store_nvd_page, cves)
+            
+            start_index += len(cves)
+            logger.info(f"NVD sync: {start_index}/{page.get('totalResults', 0)} CVEs")
+            if not cves or start_index >= page.get('totalResults', 0):
+                break
+            await asyncio.sleep(page_delay)
+        
+        await asyncio.to_thread(self._set_nvd_mirror_last_sync, sync_started)
+        logger.info(f"NVD sync completed: {written} CVEs written")
+        return written
+    
+    def _open_nvd_mirror(self) -> sqlite3.Connection:
+        """Open the NVD mirror, creating its directory and schema if needed"""
+        mirror_dir = os.path.dirname(self.nvd_mirror_path)
+        if mirror_dir:
+            os.makedirs(mirror_dir, exist_ok=True)
+        conn = sqlite3.connect(self.nvd_mirror_path)
+        conn.executescript(NVD_MIRROR_SCHEMA)
+        return conn
+    
+    def _nvd_mirror_last_sync(self) -> Optional[datetime]:
+        """When the NVD mirror was last synced, None if it never has been"""
+        if not os.path.exists(self.nvd_mirror_path):
+            return None
+        with closing(self._open_nvd_mirror()) as conn:
+            row = conn.execute(LAST_SYNC_SQL).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+    
+    def _set_nvd_mirror_last_sync(self, synced_at: datetime):
+        """Record a completed NVD mirror sync"""
+        with closing(self._open_nvd_mirror()) as conn, conn:
+            conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES ('last_sync', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (synced_at.isoformat(),)
+            )
+    
+    def _store_nvd_page(self, cves: List[Dict[str, Any]]) -> int:
+        """Upsert one page of NVD CVE records into the mirror"""
+        rows = []
+        for cve in cves:
+            # Product names sit in the fifth field of cpe:2.3:part:vendor:product:...
+            products = {
+                match['criteria'].split(':')[4]
+                for config in cve.get('configurations', [])
+                for node in config.get('nodes', [])
+                for match in node.get('cpeMatch', [])
+                if match.get('criteria', '').count(':') >= 4
+            }
+            description = next(
+                (d.get('value', '') for d in cve.get('descriptions', []) if d.get('lang') == 'en'),
+                ''
+            )
+            cvss_score = cvss_base_score(cve)
+            rows.append((
+                cve['id'], ' '.join(sorted(products)), description, cvss_score,
+                CVSS_SEVERITIES[bisect_right(CVSS_BREAKPOINTS, cvss_score)],
+                cve.get('published'), cve.get('lastModified'), to_json(cve)
+            ))
+        
+        with closing(self._open_nvd_mirror()) as conn, conn:
+            conn.executemany(UPSERT_MIRROR_CVE_SQL, rows)
+        return len(rows)
+    
+    def _search_nvd_mirror(self, package_name: str) -> Optional[Dict[str, Any]]:
+        """Keyword search the NVD mirror, None if it hasn't been synced yet"""
+        if not os.path.exists(self.nvd_mirror_path):
+            return None
+        # Quote the name as one FTS phrase so punctuation in package names
+        # isn't read as query syntax
+        phrase = '"' + package_name.replace('"', '""') + '"'
+        try:
+            with closing(sqlite3.connect(self.nvd_mirror_path)) as conn:
+                if conn.execute(LAST_SYNC_SQL).fetchone() is None:
+                    return None
+                rows = conn.execute(SEARCH_MIRROR_SQL, (phrase, NVD_RESULTS_PER_KEYWORD)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"NVD mirror search failed for {package_name}: {str(e)}")
+            return None
+        return {'vulnerabilities': [{'cve': orjson.loads(raw)} for (raw,) in rows]}
+    
     def _is_version_affected(self, package_version: str, cve_data: Dict) -> bool:
         """
         Check if a package version is affected by a CVE
@@ -476,24 +833,20 @@ class SecurityWorker:
         path = f"/{resource_type}/{resource_id}"
         
         # Create signature
-        signature_data = f"{path}:{expires_at.timestamp()}:{','.join(permissions)}"
-        signature = hmac.new(
-            self.secret_key.encode(),
-            signature_data.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        signature_data = f"{path}:{int(expires_at.timestamp())}:{','.join(permissions)}"
+        signature = self._sign(signature_data)
         
         # Build signed URL
-        params = {
-            'signature': signature,
-            'expires': int(expires_at.timestamp()),
-            'permissions': ','.join(permissions)
-        }
+        query = (
+            f"signature={signature}"
+            f"&expires={int(expires_at.timestamp())}"
+            f"&permissions={urllib.parse.quote(','.join(permissions), safe=',')}"
+        )
         
-        url = f"{self.base_url}{path}?{urllib.parse.urlencode(params)}"
+        url = f"{self.base_url}{path}?{query}"
         
         signed_url = SignedURL(
-            id=f"url_{hashlib.md5(url.encode()).hexdigest()}",
+            id=self._id('url', url),
             url=url,
             resource_type=resource_type,
             resource_id=resource_id,
@@ -508,6 +861,7 @@ class SecurityWorker:
         
         # Save to database
         await self._save_signed_url(signed_url)
+        self._cache_signed_url_uses(signed_url.id, max_accesses, expires_at.timestamp())
         
         logger.info(f"Created signed URL for {resource_type}/{resource_id}")
         return signed_url
@@ -523,47 +877,68 @@ class SecurityWorker:
             True if URL is valid
         """
         try:
-            parsed = urllib.parse.urlparse(url)
-            params = urllib.parse.parse_qs(parsed.query)
+            path, params = self._parse_signed_url(url)
             
-            signature = params.get('signature', [''])[0]
-            expires = int(params.get('expires', ['0'])[0])
-            permissions = params.get('permissions', [''])[0].split(',')
+            signature = params.get('signature', '')
+            expires = int(params.get('expires', '0'))
+            permissions = params.get('permissions', '').split(',')
             
             # Check if expired
             if datetime.now().timestamp() > expires:
                 return False
             
             # Recreate signature
-            path = parsed.path
             signature_data = f"{path}:{expires}:{','.join(permissions)}"
-            expected_signature = hmac.new(
-                self.secret_key.encode(),
-                signature_data.encode(),
-                hashlib.sha256
-            ).hexdigest()
-            
-            # Compare signatures
-            if signature != expected_signature:
+            expected_signature = self._sign(signature_data)
+            
+            # Compare signatures in constant time
+            if not hmac.compare_digest(signature, expected_signature):
                 return False
             
-            # Check access count
-            url_id = f"url_{hashlib.md5(url.encode()).hexdigest()}"
-            current_count = await self._get_signed_url_access_count(url_id)
-            max_accesses = await self._get_signed_url_max_accesses(url_id)
+            # Count this access, unless the URL is used up or expired
+            url_id = self._id('url', url)
+            try:
+                remaining = self._decr_signed_url(keys=[f"surl:{url_id}"])
+            except redis.RedisError as e:
+                logger.warning(f"Signed URL cache unavailable: {str(e)}")
+                remaining = None
             
-            if current_count >= max_accesses:
-                return False
+            if remaining is None:
+                # Not cached: consume in Postgres and seed the cache from it
+                consumed = await self._consume_signed_url(url_id)
+                if consumed is None:
+                    return False
+                self._cache_signed_url_uses(url_id, consumed['remaining'], consumed['expires_at'].timestamp())
+                return True
             
-            # Increment access count
-            await self._increment_signed_url_access_count(url_id)
+            if remaining < 0:
+                return False
             
+            self._record_signed_url_access(url_id)
             return True
             
         except Exception as e:
             logger.error(f"Error validating signed URL: {str(e)}")
             return False
     
+    def _parse_signed_url(self, url: str) -> Tuple[str, Dict[str, str]]:
+        """Split a signed URL into its path and query parameters"""
+        base, _, query = url.partition('?')
+        if query and base.startswith(self.base_url):
+            # URLs we issued are always base_url + path + flat query string
+            try:
+                params = dict(pair.split('=', 1) for pair in query.split('&'))
+            except ValueError:
+                pass
+            else:
+                for key, value in params.items():
+                    if '%' in value or '+' in value:
+                        params[key] = urllib.parse.unquote_plus(value)
+                return base[len(self.base_url):], params
+        
+        parsed = urllib.parse.urlparse(url)
+        return parsed.path, {key: values[0] for key, values in urllib.parse.parse_qs(parsed.query).items()}
+    
     async def create_rls_rule(self, name: str, table: str, policy: str, 
                             roles: List[str], conditions: str, description: str) -> RLSRule:
         """
@@ -581,7 +956,7 @@ class SecurityWorker:
             RLSRule object
         """
         rls_rule = RLSRule(
-            id=f"rls_{hashlib.md5(f"{name}{table}".encode()).hexdigest()}",
+            id=self._id('rls', name, table),
             name=name,
             table=table,
             policy=policy,
@@ -594,17 +969,25 @@ class SecurityWorker:
             description=description
         )
         
-        # Save to database
-        await self._save_rls_rule(rls_rule)
-        
-        # Apply RLS policy to database
-        await self._apply_rls_policy(rls_rule)
+        await asyncio.to_thread(self._store_rls_rule, rls_rule)
         
         logger.info(f"Created RLS rule: {name} for table {table}")
         return rls_rule
     
+    def _store_rls_rule(self, rls_rule: RLSRule):
+        """Save the rule and apply its policy in one transaction, so a policy
+        that fails to apply leaves no rule behind"""
+        with self.get_db_connection() as conn:
+            with conn.cursor() as cur:
+                self._save_rls_rule(cur, rls_rule)
+                self._apply_rls_policy(cur, rls_rule)
+    
     async def _save_security_scan(self, scan: SecurityScan):
-        """Save security scan to database"""
+        """Save security scan to database, off the event loop"""
+        await asyncio.to_thread(self._write_security_scan, scan)
+    
+    def _write_security_scan(self, scan: SecurityScan):
+        """Upsert a security scan row"""
         with self.get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
@@ -627,33 +1010,50 @@ class SecurityWorker:
                 """, (
                     scan.id, scan.type, scan.status, scan.started_at, scan.completed_at,
                     scan.vulnerabilities_found, scan.critical_count, scan.high_count,
-                    scan.medium_count, scan.low_count, json.dumps(scan.scan_config), scan.results_summary
+                    scan.medium_count, scan.low_count, to_json(scan.scan_config), scan.results_summary
                 ))
     
-    async def _save_vulnerability(self, vuln: Vulnerability):
-        """Save vulnerability to database"""
+    async def _save_vulnerabilities_bulk(self, vulns: List[Vulnerability]):
+        """Upsert vulnerabilities to database in one batch"""
+        if not vulns:
+            return
+        # One statement can't upsert the same id twice, and Trivy repeats
+        # findings across targets
+        unique_vulns = {vuln.id: vuln for vuln in vulns}
+        rows = [
+            (
+                vuln.id, vuln.package_name, vuln.package_version, vuln.vulnerability_id,
+                vuln.severity, vuln.title, vuln.description, vuln.cve_id, vuln.cvss_score,
+                to_json(vuln.affected_versions), to_json(vuln.fixed_versions),
+                vuln.published_date, vuln.last_updated, vuln.status, vuln.remediation,
+                to_json(vuln.references)
+            )
+            for vuln in unique_vulns.values()
+        ]
+        await asyncio.to_thread(self._write_vulnerabilities, rows)
+    
+    def _write_vulnerabilities(self, rows: List[tuple]):
+        """Upsert prepared vulnerability rows in pages of 500"""
         with self.get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
+                execute_values(cur, """
                     INSERT INTO security_vulnerabilities (
                         id, package_name, package_version, vulnerability_id,
                         severity, title, description, cve_id, cvss_score,
                         affected_versions, fixed_versions, published_date,
                         last_updated, status, remediation, references
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ) VALUES %s
                     ON CONFLICT (id) DO UPDATE SET
                         status = EXCLUDED.status,
                         last_updated = EXCLUDED.last_updated
-                """, (
-                    vuln.id, vuln.package_name, vuln.package_version, vuln.vulnerability_id,
-                    vuln.severity, vuln.title, vuln.description, vuln.cve_id, vuln.cvss_score,
-                    json.dumps(vuln.affected_versions), json.dumps(vuln.fixed_versions),
-                    vuln.published_date, vuln.last_updated, vuln.status, vuln.remediation,
-                    json.dumps(vuln.references)
-                ))
+                """, rows, page_size=500)
     
     async def _save_signed_url(self, signed_url: SignedURL):
-        """Save signed URL to database"""
+        """Save signed URL to database, off the event loop"""
+        await asyncio.to_thread(self._write_signed_url, signed_url)
+    
+    def _write_signed_url(self, signed_url: SignedURL):
+        """Upsert a signed URL row"""
         with self.get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
@@ -670,86 +1070,122 @@ class SecurityWorker:
                     signed_url.id, signed_url.url, signed_url.resource_type,
                     signed_url.resource_id, signed_url.expires_at, signed_url.created_at,
                     signed_url.created_by, signed_url.access_count, signed_url.max_accesses,
-                    signed_url.status, json.dumps(signed_url.permissions)
+                    signed_url.status, to_json(signed_url.permissions)
                 ))
     
-    async def _save_rls_rule(self, rls_rule: RLSRule):
+    def _save_rls_rule(self, cur, rls_rule: RLSRule):
         """Save RLS rule to database"""
-        with self.get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO rls_rules (
-                        id, name, table_name, policy, roles, conditions,
-                        status, created_at, updated_at, created_by, description
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id) DO UPDATE SET
-                        status = EXCLUDED.status,
-                        updated_at = EXCLUDED.updated_at
-                """, (
-                    rls_rule.id, rls_rule.name, rls_rule.table, rls_rule.policy,
-                    json.dumps(rls_rule.roles), rls_rule.conditions, rls_rule.status,
-                    rls_rule.created_at, rls_rule.updated_at, rls_rule.created_by,
-                    rls_rule.description
-                ))
+        cur.execute("""
+            INSERT INTO rls_rules (
+                id, name, table_name, policy, roles, conditions,
+                status, created_at, updated_at, created_by, description
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (id) DO UPDATE SET
+                status = EXCLUDED.status,
+                updated_at = EXCLUDED.updated_at
+        """, (
+            rls_rule.id, rls_rule.name, rls_rule.table, rls_rule.policy,
+            to_json(rls_rule.roles), rls_rule.conditions, rls_rule.status,
+            rls_rule.created_at, rls_rule.updated_at, rls_rule.created_by,
+            rls_rule.description
+        ))
     
-    async def _get_signed_url_access_count(self, url_id: str) -> int:
-        """Get current access count for signed URL"""
-        with self.get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT access_count FROM signed_urls WHERE id = %s", (url_id,))
-                result = cur.fetchone()
-                return result[0] if result else 0
-    
-    async def _get_signed_url_max_accesses(self, url_id: str) -> int:
-        """Get max accesses for signed URL"""
-        with self.get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT max_accesses FROM signed_urls WHERE id = %s", (url_id,))
-                result = cur.fetchone()
-                return result[0] if result else 1
+    async def _consume_signed_url(self, url_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically count one access to a signed URL, None if none are left"""
+        return await asyncio.to_thread(self._take_signed_url_access, url_id)
     
-    async def _increment_signed_url_access_count(self, url_id: str):
-        """Increment access count for signed URL"""
+    def _take_signed_url_access(self, url_id: str) -> Optional[Dict[str, Any]]:
+        """Count one access in signed_urls if the URL is live and has uses left"""
         with self.get_db_connection() as conn:
-            with conn.cursor() as cur:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
-                    UPDATE signed_urls 
+                    UPDATE signed_urls
                     SET access_count = access_count + 1, updated_at = NOW()
-                    WHERE id = %s
+                    WHERE id = %s AND access_count < max_accesses AND expires_at > NOW()
+                    RETURNING max_accesses - access_count AS remaining, expires_at
                 """, (url_id,))
+                return cur.fetchone()
     
-    async def _apply_rls_policy(self, rls_rule: RLSRule):
-        """Apply RLS policy to database table"""
+    def _record_signed_url_access(self, url_id: str):
+        """Queue an access already admitted by the Redis counter for the next flush"""
+        self._dirty_urls[url_id] = self._dirty_urls.get(url_id, 0) + 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        """Write queued signed URL accesses to Postgres once per interval"""
+        while True:
+            await asyncio.sleep(SIGNED_URL_FLUSH_INTERVAL)
+            await self._flush_signed_url_accesses()
+    
+    async def _flush_signed_url_accesses(self):
+        """Add all queued access counts to signed_urls in one statement, off the event loop"""
+        if not self._dirty_urls:
+            return
+        pending, self._dirty_urls = self._dirty_urls, {}
+        try:
+            await asyncio.to_thread(self._write_signed_url_accesses, pending)
+        except Exception as e:
+            logger.error(f"Error flushing signed URL access counts: {str(e)}")
+            # Keep the counts for the next tick
+            for url_id, n in pending.items():
+                self._dirty_urls[url_id] = self._dirty_urls.get(url_id, 0) + n
+    
+    def _write_signed_url_accesses(self, pending: Dict[str, int]):
+        """Apply a batch of access counts to signed_urls"""
         with self.get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Enable RLS on table if not already enabled
-                cur.execute(f"ALTER TABLE {rls_rule.table} ENABLE ROW LEVEL SECURITY")
-                
-                # Create policy
-                policy_sql = f"""
-                    CREATE POLICY {rls_rule.policy} ON {rls_rule.table}
-                    FOR ALL USING ({rls_rule.conditions})
-                """
-                cur.execute(policy_sql)
+                execute_values(cur, """
+                    UPDATE signed_urls
+                    SET access_count = signed_urls.access_count + d.n, updated_at = NOW()
+                    FROM (VALUES %s) AS d(id, n)
+                    WHERE signed_urls.id = d.id
+                """, list(pending.items()))
+    
+    def _cache_signed_url_uses(self, url_id: str, remaining: int, expires_at: float):
+        """Cache a signed URL's remaining uses until the URL itself expires"""
+        try:
+            self.redis_client.set(f"surl:{url_id}", remaining, exat=int(expires_at))
+        except redis.RedisError as e:
+            logger.warning(f"Signed URL cache write failed for {url_id}: {str(e)}")
+    
+    def _apply_rls_policy(self, cur, rls_rule: RLSRule):
+        """Apply RLS policy to database table"""
+        # Table and policy names are quoted as identifiers (the table may be
+        # schema-qualified); the conditions are a trusted SQL expression.
+        # Both statements go to the server in one round trip.
+        table = sql.Identifier(*rls_rule.table.split('.'))
+        cur.execute(sql.SQL("""
+            ALTER TABLE {table} ENABLE ROW LEVEL SECURITY;
+            CREATE POLICY {policy} ON {table}
+            FOR ALL USING ({conditions})
+        """).format(
+            table=table,
+            policy=sql.Identifier(rls_rule.policy),
+            conditions=sql.SQL(rls_rule.conditions)
+        ))
 
 async def main():
     """Main function for testing"""
     worker = SecurityWorker()
     
-    # Test dependency scanning
-    print("Testing dependency scanning...")
-    scan_result = await worker.scan_dependencies("/path/to/project")
-    print(f"Scan result: {scan_result.results_summary}")
-    
-    # Test signed URL creation
-    print("\nTesting signed URL creation...")
-    signed_url = await worker.create_signed_url("image", "post_123", 24, 10, ["read"])
-    print(f"Signed URL: {signed_url.url}")
-    
-    # Test URL validation
-    print("\nTesting URL validation...")
-    is_valid = await worker.validate_signed_url(signed_url.url)
-    print(f"URL valid: {is_valid}")
+    try:
+        # Test dependency scanning
+        print("Testing dependency scanning...")
+        scan_result = await worker.scan_dependencies("/path/to/project")
+        print(f"Scan result: {scan_result.results_summary}")
+        
+        # Test signed URL creation
+        print("\nTesting signed URL creation...")
+        signed_url = await worker.create_signed_url("image", "post_123", 24, 10, ["read"])
+        print(f"Signed URL: {signed_url.url}")
+        
+        # Test URL validation
+        print("\nTesting URL validation...")
+        is_valid = await worker.validate_signed_url(signed_url.url)
+        print(f"URL valid: {is_valid}")
+    finally:
+        await worker.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -4,19 +4,120 @@ SEO Worker - On-page SEO analysis and optimization
 """
 
 import asyncio
+import hashlib
+import math
+import os
 import re
 import json
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+import threading
+from pathlib import Path
+from string import Template
+from collections import Counter
+from functools import cached_property, lru_cache
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import ahocorasick
+import asyncpg
 import openai
-from bs4 import BeautifulSoup
+import orjson
+from lxml import etree
 import readability
 from textstat import textstat
 import yaml
 
+# OpenAI configuration
+openai.api_key = 'YOUR_OPENAI_API_KEY'
+
+# Readability metrics are memoised per content hash once text is this long
+READABILITY_CACHE_MIN_LENGTH = 2000
+READABILITY_CACHE_SIZE = 256
+
+# On-disk cache of finished checks, keyed by a digest of the analysed fields.
+# Bump SEO_CACHE_VERSION whenever scoring changes (analyzers, THRESHOLDS, word
+# lists, readability rules) or SEOCheck's fields change, so old entries miss.
+SEO_CACHE_VERSION = 2
+SEO_CACHE_MAX_ENTRIES = 10000
+SEO_CACHE_PRUNE_INTERVAL = 100
+SEO_CACHE_KEY_FIELDS = ('title', 'meta_description', 'slug', 'content', 'target_keyword', 'created_at', 'updated_at')
+
+# Tokenisation rules shared with textstat, so scores match its Flesch formulas
+QUOTE_RE = re.compile(r"\'(?![tsd]\b|ve\b|ll\b|re\b)")
+PUNCTUATION_RE = re.compile(r"[^\w\s\']")
+SENTENCE_RE = re.compile(r'\b[^.!?]+[.!?]*')
+
+def strip_punctuation(text: str) -> str:
+    """Remove punctuation, keeping apostrophes in contractions"""
+    return PUNCTUATION_RE.sub('', QUOTE_RE.sub('"', text))
+
+@lru_cache(maxsize=8192)
+def word_syllables(word: str) -> int:
+    """Count syllables in a lowercased word using textstat's hyphenator"""
+    return len(textstat.pyphen.positions(word)) + 1
+
+def legacy_round(number: float, points: int) -> float:
+    """Round half away from zero, as textstat does"""
+    p = 10 ** points
+    return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+HEADING_TAGS = frozenset(['h1', 'h2', 'h3'])
+# Text inside these tags is not part of the visible content
+HIDDEN_TEXT_TAGS = frozenset(['script', 'style', 'template'])
+
+SAVE_SEO_ANALYSIS_SQL = """
+    INSERT INTO qa_checks (post_id, check_type, status, score, message, data, created_at, updated_at)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+    ON CONFLICT (post_id, check_type) 
+    DO UPDATE SET 
+        status = EXCLUDED.status,
+        score = EXCLUDED.score,
+        message = EXCLUDED.message,
+        data = EXCLUDED.data,
+        updated_at = EXCLUDED.updated_at
+"""
+
+def build_automaton(words: Dict[str, str]) -> ahocorasick.Automaton:
+    """Build an Aho-Corasick automaton mapping each word to its value"""
+    automaton = ahocorasick.Automaton()
+    for word, value in words.items():
+        automaton.add_word(word, value)
+    automaton.make_automaton()
+    return automaton
+
+def build_schema_template() -> Template:
+    """Encode the schema suggestion skeleton with per-post placeholders"""
+    placeholders = ['headline', 'date_published', 'date_modified', 'description', 'page_id']
+    schema = {
+        "@context": "https://schema.org",
+        "@type": "Article",
+        "headline": "$headline",
+        "author": {
+            "@type": "Person",
+            "name": "Author Name"  # Get from user data
+        },
+        "datePublished": "$date_published",
+        "dateModified": "$date_modified",
+        "publisher": {
+            "@type": "Organization",
+            "name": "Your Brand",
+            "logo": {
+                "@type": "ImageObject",
+                "url": "https://yourdomain.com/logo.png"
+            }
+        },
+        "description": "$description",
+        "mainEntityOfPage": {
+            "@type": "WebPage",
+            "@id": "$page_id"
+        }
+    }
+    
+    encoded = json.dumps(schema, indent=2)
+    for name in placeholders:
+        encoded = encoded.replace(f'"${name}"', f'${name}')
+    return Template(encoded)
+
 @dataclass
 class SEOCheck:
     check_type: str
@@ -26,6 +127,30 @@ class SEOCheck:
     suggestions: List[str]
     data: Dict[str, Any]
 
+    @cached_property
+    def as_dict(self) -> Dict[str, Any]:
+        """Serializable form shared by the stored payload and the response"""
+        return {
+            'type': self.check_type,
+            'status': self.status,
+            'score': self.score,
+            'message': self.message,
+            'suggestions': self.suggestions,
+            'data': self.data
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SEOCheck':
+        """Rebuild a check from its as_dict form"""
+        return cls(
+            check_type=data['type'],
+            status=data['status'],
+            score=data['score'],
+            message=data['message'],
+            suggestions=data['suggestions'],
+            data=data['data']
+        )
+
 @dataclass
 class SEOAnalysis:
     post_id: str
@@ -34,7 +159,111 @@ class SEOAnalysis:
     created_at: datetime
     updated_at: datetime
 
+@dataclass
+class SEOContent:
+    """Everything the content checks need from a draft's HTML"""
+    text: str = ''
+    headings: Counter = field(default_factory=Counter)
+    links: List[Tuple[str, str]] = field(default_factory=list)  # (href, anchor text)
+    schema: Optional[str] = None  # first application/ld+json script body
+
+class SEOContentTarget:
+    """lxml parser target that collects SEOContent in a single streaming pass"""
+    
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._text: List[str] = []
+        self._headings = Counter()
+        self._links: List[Tuple[str, List[str]]] = []
+        self._open_anchors: List[List[str]] = []
+        self._schema: Optional[List[str]] = None
+        self._in_schema = False
+        self._hidden_depth = 0
+
+    def start(self, tag: str, attrib: Dict[str, str]):
+        if tag in HEADING_TAGS:
+            self._headings[tag] += 1
+        elif tag == 'a':
+            anchor_text: List[str] = []
+            self._links.append((attrib.get('href', ''), anchor_text))
+            self._open_anchors.append(anchor_text)
+        elif tag == 'script' and self._schema is None and attrib.get('type') == 'application/ld+json':
+            self._schema = []
+            self._in_schema = True
+        
+        if tag in HIDDEN_TEXT_TAGS:
+            self._hidden_depth += 1
+
+    def end(self, tag: str):
+        if tag == 'a' and self._open_anchors:
+            self._open_anchors.pop()
+        elif tag == 'script':
+            self._in_schema = False
+        
+        if tag in HIDDEN_TEXT_TAGS and self._hidden_depth:
+            self._hidden_depth -= 1
+
+    def data(self, data: str):
+        if not self._hidden_depth:
+            self._text.append(data)
+        elif self._in_schema:
+            self._schema.append(data)
+        for anchor_text in self._open_anchors:
+            anchor_text.append(data)
+
+    def close(self) -> SEOContent:
+        content = SEOContent(
+            text=''.join(self._text),
+            headings=self._headings,
+            links=[(href, ''.join(anchor_text)) for href, anchor_text in self._links],
+            schema=''.join(self._schema) if self._schema is not None else None
+        )
+        # Ready for the next document when the parser is reused
+        self._reset()
+        return content
+
 class SEOWorker:
+    # SEO thresholds
+    THRESHOLDS: ClassVar[Dict[str, Dict[str, float]]] = {
+        'title_length': {'min': 30, 'max': 60},
+        'meta_length': {'min': 120, 'max': 160},
+        'heading_structure': {'min_h1': 1, 'max_h1': 1},
+        'readability': {'min_flesch': 60, 'min_grade': 8},
+        'word_count': {'min': 300, 'target': 1500},
+        'keyword_density': {'min': 0.5, 'max': 2.5},
+        'internal_links': {'min': 2},
+        'external_links': {'min': 1, 'max': 10}
+    }
+    
+    # Patterns and word lists used by the analyzers
+    SLUG_RE: ClassVar[re.Pattern] = re.compile(r'^[a-z0-9-]+$')
+    BRAND_TERMS: ClassVar[frozenset] = frozenset(['ai', 'blog', 'writer'])
+    EMOTIONAL_WORDS: ClassVar[frozenset] = frozenset(['best', 'ultimate', 'complete', 'guide', 'tips', 'secrets'])
+    CTA_WORDS: ClassVar[frozenset] = frozenset(['learn', 'discover', 'find', 'get', 'read', 'explore'])
+    GENERIC_ANCHORS: ClassVar[frozenset] = frozenset(['click here', 'read more', 'learn more'])
+    
+    # Simple LSI keywords - in production, use a more sophisticated approach
+    LSI_MAP: ClassVar[Dict[str, frozenset]] = {
+        'ai blog writing': frozenset(['content creation', 'artificial intelligence', 'blogging', 'seo', 'marketing']),
+        'seo optimization': frozenset(['search engine', 'keywords', 'ranking', 'traffic', 'analytics']),
+        'content marketing': frozenset(['strategy', 'audience', 'engagement', 'conversion', 'brand']),
+        'digital marketing': frozenset(['online', 'social media', 'email', 'advertising', 'campaigns'])
+    }
+    
+    # Aho-Corasick automata so each text is scanned once per word list
+    TITLE_AUTOMATON: ClassVar[ahocorasick.Automaton] = build_automaton(
+        {**{word: 'emotional' for word in EMOTIONAL_WORDS}, **{brand: 'brand' for brand in BRAND_TERMS}}
+    )
+    CTA_AUTOMATON: ClassVar[ahocorasick.Automaton] = build_automaton({word: word for word in CTA_WORDS})
+    LSI_AUTOMATON: ClassVar[ahocorasick.Automaton] = build_automaton(
+        {lsi: lsi for keywords in LSI_MAP.values() for lsi in keywords}
+    )
+    
+    # Schema suggestion encoded once; only the per-post fields are filled in
+    SCHEMA_TEMPLATE: ClassVar[Template] = build_schema_template()
+
     def __init__(self):
         # Database connection
         self.db_config = {
@@ -43,43 +272,52 @@ class SEOWorker:
             'user': 'postgres',
             'password': 'postgres'
         }
+        self._db_pool: Optional[asyncpg.Pool] = None
         
-        # OpenAI configuration
-        openai.api_key = 'YOUR_OPENAI_API_KEY'
-        
-        # SEO thresholds
-        self.thresholds = {
-            'title_length': {'min': 30, 'max': 60},
-            'meta_length': {'min': 120, 'max': 160},
-            'heading_structure': {'min_h1': 1, 'max_h1': 1},
-            'readability': {'min_flesch': 60, 'min_grade': 8},
-            'word_count': {'min': 300, 'target': 1500},
-            'keyword_density': {'min': 0.5, 'max': 2.5},
-            'internal_links': {'min': 2},
-            'external_links': {'min': 1, 'max': 10}
-        }
+        # Thread pool for the CPU-bound content analyzers
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        
+        # Readability metrics keyed by content hash, oldest evicted first
+        self._readability_cache: Dict[str, tuple] = {}
+        self._readability_lock = threading.Lock()
+        
+        # One reusable content parser per thread
+        self._parser_local = threading.local()
+        
+        # Finished checks cached on disk across runs
+        self._cache_dir = Path(os.getenv('SEO_CACHE_DIR', '/var/cache/seo_worker'))
+        self._cache_writes = 0
 
-    async def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(**self.db_config)
+    async def get_db_pool(self) -> asyncpg.Pool:
+        """Get the shared database connection pool"""
+        if self._db_pool is None:
+            self._db_pool = await asyncpg.create_pool(
+                min_size=5, max_size=20, max_inactive_connection_lifetime=300,
+                command_timeout=60, **self.db_config
+            )
+        return self._db_pool
+
+    async def close(self):
+        """Close the shared database pool and analyzer threads"""
+        if self._db_pool is not None:
+            await self._db_pool.close()
+            self._db_pool = None
+        self._executor.shutdown(wait=False)
 
     async def get_post_data(self, post_id: str) -> Dict[str, Any]:
         """Fetch post data including content and metadata"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get post data
-                await cur.execute("""
-                    SELECT p.*, d.content, d.citations
-                    FROM posts p
-                    LEFT JOIN drafts d ON p.id = d.post_id
-                    WHERE p.id = %s
-                """, (post_id,))
-                post_data = await cur.fetchone()
-                
-                if not post_data:
-                    raise ValueError(f"Post {post_id} not found")
-                
-                return dict(post_data)
+        pool = await self.get_db_pool()
+        post_data = await pool.fetchrow("""
+            SELECT p.*, d.content, d.citations
+            FROM posts p
+            LEFT JOIN drafts d ON p.id = d.post_id
+            WHERE p.id = $1
+        """, post_id)
+        
+        if not post_data:
+            raise ValueError(f"Post {post_id} not found")
+        
+        return dict(post_data)
 
     def analyze_title(self, title: str, target_keyword: str) -> SEOCheck:
         """Analyze post title for SEO"""
@@ -88,25 +326,29 @@ class SEOWorker:
         
         # Length check
         title_length = len(title)
-        if title_length < self.thresholds['title_length']['min']:
+        title_lower = title.lower()
+        keyword_in_title = target_keyword.lower() in title_lower if target_keyword else None
+        if title_length < self.THRESHOLDS['title_length']['min']:
             score -= 20
             suggestions.append(f"Title too short ({title_length} chars). Aim for 30-60 characters.")
-        elif title_length > self.thresholds['title_length']['max']:
+        elif title_length > self.THRESHOLDS['title_length']['max']:
             score -= 15
             suggestions.append(f"Title too long ({title_length} chars). Aim for 30-60 characters.")
         
         # Keyword presence
-        if target_keyword and target_keyword.lower() not in title.lower():
+        if target_keyword and not keyword_in_title:
             score -= 25
             suggestions.append(f"Target keyword '{target_keyword}' not found in title")
         
+        # Brand and emotional trigger words in one scan of the title
+        title_terms = {kind for _, kind in self.TITLE_AUTOMATON.iter(title_lower)}
+        
         # Brand presence (optional)
-        if not any(brand in title.lower() for brand in ['ai', 'blog', 'writer']):
+        if 'brand' not in title_terms:
             suggestions.append("Consider including brand terms in title")
         
         # Emotional triggers
-        emotional_words = ['best', 'ultimate', 'complete', 'guide', 'tips', 'secrets']
-        if not any(word in title.lower() for word in emotional_words):
+        if 'emotional' not in title_terms:
             suggestions.append("Consider adding emotional trigger words")
         
         status = 'pass' if score >= 80 else 'warning' if score >= 60 else 'fail'
@@ -117,7 +359,7 @@ class SEOWorker:
             score=score,
             message=f"Title analysis: {title_length} characters",
             suggestions=suggestions,
-            data={'length': title_length, 'keyword_present': target_keyword.lower() in title.lower() if target_keyword else None}
+            data={'length': title_length, 'keyword_present': keyword_in_title}
         )
 
     def analyze_meta_description(self, meta_desc: str, target_keyword: str) -> SEOCheck:
@@ -137,21 +379,22 @@ class SEOWorker:
         
         # Length check
         meta_length = len(meta_desc)
-        if meta_length < self.thresholds['meta_length']['min']:
+        meta_lower = meta_desc.lower()
+        keyword_in_meta = target_keyword.lower() in meta_lower if target_keyword else None
+        if meta_length < self.THRESHOLDS['meta_length']['min']:
             score -= 20
             suggestions.append(f"Meta description too short ({meta_length} chars). Aim for 120-160 characters.")
-        elif meta_length > self.thresholds['meta_length']['max']:
+        elif meta_length > self.THRESHOLDS['meta_length']['max']:
             score -= 15
             suggestions.append(f"Meta description too long ({meta_length} chars). Aim for 120-160 characters.")
         
         # Keyword presence
-        if target_keyword and target_keyword.lower() not in meta_desc.lower():
+        if target_keyword and not keyword_in_meta:
             score -= 25
             suggestions.append(f"Target keyword '{target_keyword}' not found in meta description")
         
         # Call to action
-        cta_words = ['learn', 'discover', 'find', 'get', 'read', 'explore']
-        if not any(word in meta_desc.lower() for word in cta_words):
+        if next(self.CTA_AUTOMATON.iter(meta_lower), None) is None:
             suggestions.append("Consider adding a call-to-action")
         
         status = 'pass' if score >= 80 else 'warning' if score >= 60 else 'fail'
@@ -162,7 +405,7 @@ class SEOWorker:
             score=score,
             message=f"Meta description: {meta_length} characters",
             suggestions=suggestions,
-            data={'length': meta_length, 'keyword_present': target_keyword.lower() in meta_desc.lower() if target_keyword else None}
+            data={'length': meta_length, 'keyword_present': keyword_in_meta}
         )
 
     def analyze_slug(self, slug: str, target_keyword: str) -> SEOCheck:
@@ -184,7 +427,7 @@ class SEOWorker:
                 suggestions.append(f"Target keyword not found in slug. Consider: {keyword_slug}")
         
         # Format check
-        if not re.match(r'^[a-z0-9-]+$', slug):
+        if not self.SLUG_RE.match(slug):
             score -= 15
             suggestions.append("Slug contains invalid characters. Use only lowercase letters, numbers, and hyphens.")
         
@@ -204,16 +447,16 @@ class SEOWorker:
             data={'length': slug_length, 'hyphen_count': slug.count('-')}
         )
 
-    def analyze_heading_structure(self, content: str) -> SEOCheck:
+    def analyze_heading_structure(self, content: SEOContent) -> SEOCheck:
         """Analyze heading structure (H1, H2, H3)"""
         suggestions = []
         score = 100.0
         
-        # Parse content to find headings
-        soup = BeautifulSoup(content, 'html.parser')
-        h1_count = len(soup.find_all('h1'))
-        h2_count = len(soup.find_all('h2'))
-        h3_count = len(soup.find_all('h3'))
+        # Headings were counted while parsing
+        counts = content.headings
+        h1_count = counts['h1']
+        h2_count = counts['h2']
+        h3_count = counts['h3']
         
         # H1 check
         if h1_count == 0:
@@ -249,30 +492,57 @@ class SEOWorker:
             data={'h1_count': h1_count, 'h2_count': h2_count, 'h3_count': h3_count, 'total': total_headings}
         )
 
-    def analyze_readability(self, content: str) -> SEOCheck:
+    def _readability_metrics(self, text_content: str) -> tuple:
+        """Compute (flesch, grade, sentences, words), cached for long content"""
+        if len(text_content) <= READABILITY_CACHE_MIN_LENGTH:
+            return self._compute_readability_metrics(text_content)
+        
+        text_hash = hashlib.blake2b(text_content.encode(), digest_size=16).hexdigest()
+        with self._readability_lock:
+            metrics = self._readability_cache.get(text_hash)
+        if metrics is None:
+            metrics = self._compute_readability_metrics(text_content)
+            with self._readability_lock:
+                self._readability_cache[text_hash] = metrics
+                if len(self._readability_cache) > READABILITY_CACHE_SIZE:
+                    del self._readability_cache[next(iter(self._readability_cache))]
+        return metrics
+
+    def _compute_readability_metrics(self, text_content: str) -> tuple:
+        """Count words, sentences and syllables once and derive both Flesch scores"""
+        words = len(strip_punctuation(text_content).split())
+        
+        # Fragments of two words or fewer don't count as sentences
+        fragments = SENTENCE_RE.findall(text_content)
+        short = sum(1 for fragment in fragments if len(strip_punctuation(fragment).split()) <= 2)
+        sentences = max(1, len(fragments) - short)
+        
+        syllables = sum(word_syllables(word) for word in strip_punctuation(text_content.lower()).split())
+        
+        sentence_length = legacy_round(words / sentences, 1)
+        syllables_per_word = legacy_round(syllables / words, 1) if words else 0.0
+        flesch_score = legacy_round(206.835 - 1.015 * sentence_length - 84.6 * syllables_per_word, 2)
+        grade_level = legacy_round(0.39 * sentence_length + 11.8 * syllables_per_word - 15.59, 1)
+        
+        return (flesch_score, grade_level, sentences, words)
+
+    def analyze_readability(self, text_content: str) -> SEOCheck:
         """Analyze content readability"""
         suggestions = []
         score = 100.0
-        
-        # Clean content for analysis
-        soup = BeautifulSoup(content, 'html.parser')
-        text_content = soup.get_text()
+        flesch_score, grade_level, sentences, words = self._readability_metrics(text_content)
         
         # Flesch Reading Ease
-        flesch_score = textstat.flesch_reading_ease(text_content)
-        if flesch_score < self.thresholds['readability']['min_flesch']:
+        if flesch_score < self.THRESHOLDS['readability']['min_flesch']:
             score -= 20
             suggestions.append(f"Content is too complex (Flesch score: {flesch_score:.1f}). Aim for 60+ for better readability.")
         
         # Grade level
-        grade_level = textstat.flesch_kincaid_grade(text_content)
-        if grade_level > self.thresholds['readability']['min_grade']:
+        if grade_level > self.THRESHOLDS['readability']['min_grade']:
             score -= 15
             suggestions.append(f"Content is too advanced (Grade level: {grade_level:.1f}). Aim for 8th grade or lower.")
         
         # Sentence length
-        sentences = textstat.sentence_count(text_content)
-        words = textstat.lexicon_count(text_content)
         avg_sentence_length = words / sentences if sentences > 0 else 0
         
         if avg_sentence_length > 20:
@@ -280,8 +550,7 @@ class SEOWorker:
             suggestions.append(f"Average sentence length is {avg_sentence_length:.1f} words. Aim for 15-20 words.")
         
         # Paragraph length
-        paragraphs = text_content.split('\n\n')
-        long_paragraphs = sum(1 for p in paragraphs if len(p.split()) > 150)
+        long_paragraphs = self._count_long_paragraphs(text_content, 150)
         if long_paragraphs > 0:
             suggestions.append(f"Found {long_paragraphs} long paragraphs. Break them up for better readability.")
         
@@ -296,7 +565,22 @@ class SEOWorker:
             data={'flesch_score': flesch_score, 'grade_level': grade_level, 'avg_sentence_length': avg_sentence_length}
         )
 
-    def analyze_keyword_density(self, content: str, target_keyword: str) -> SEOCheck:
+    def _count_long_paragraphs(self, text_content: str, max_words: int) -> int:
+        """Count blank-line separated paragraphs with more than max_words words"""
+        # More than max_words words need at least one character and one separator each
+        min_length = 2 * max_words + 1
+        long_paragraphs = 0
+        start = 0
+        while True:
+            end = text_content.find('\n\n', start)
+            stop = len(text_content) if end == -1 else end
+            if stop - start >= min_length and len(text_content[start:stop].split()) > max_words:
+                long_paragraphs += 1
+            if end == -1:
+                return long_paragraphs
+            start = end + 2
+
+    def analyze_keyword_density(self, text_content: str, total_words: int, target_keyword: str) -> SEOCheck:
         """Analyze keyword density and usage"""
         suggestions = []
         score = 100.0
@@ -311,34 +595,29 @@ class SEOWorker:
                 data={'density': 0, 'occurrences': 0}
             )
         
-        # Clean content
-        soup = BeautifulSoup(content, 'html.parser')
-        text_content = soup.get_text().lower()
-        
-        # Count keyword occurrences
+        # Count keyword occurrences (text_content is already lowercased)
         keyword_lower = target_keyword.lower()
         occurrences = text_content.count(keyword_lower)
         
         # Calculate density
-        total_words = len(text_content.split())
         density = (occurrences / total_words * 100) if total_words > 0 else 0
         
         # Density check
-        if density < self.thresholds['keyword_density']['min']:
+        if density < self.THRESHOLDS['keyword_density']['min']:
             score -= 25
             suggestions.append(f"Keyword density too low ({density:.2f}%). Aim for 0.5-2.5%.")
-        elif density > self.thresholds['keyword_density']['max']:
+        elif density > self.THRESHOLDS['keyword_density']['max']:
             score -= 30
             suggestions.append(f"Keyword density too high ({density:.2f}%). Aim for 0.5-2.5%.")
         
         # Keyword placement
-        if keyword_lower not in text_content[:500]:  # First 500 characters
+        if text_content.find(keyword_lower, 0, 500) == -1:  # First 500 characters
             score -= 15
             suggestions.append("Target keyword not found in the first paragraph.")
         
         # LSI keywords (simple check)
-        lsi_keywords = self._get_lsi_keywords(target_keyword)
-        found_lsi = sum(1 for lsi in lsi_keywords if lsi in text_content)
+        lsi_keywords = self._get_lsi_keywords(keyword_lower)
+        found_lsi = len(lsi_keywords.intersection(lsi for _, lsi in self.LSI_AUTOMATON.iter(text_content))) if lsi_keywords else 0
         if found_lsi < 2:
             suggestions.append("Consider adding more related keywords (LSI keywords).")
         
@@ -353,40 +632,41 @@ class SEOWorker:
             data={'density': density, 'occurrences': occurrences, 'total_words': total_words}
         )
 
-    def analyze_links(self, content: str) -> SEOCheck:
+    def analyze_links(self, content: SEOContent) -> SEOCheck:
         """Analyze internal and external links"""
         suggestions = []
         score = 100.0
         
-        soup = BeautifulSoup(content, 'html.parser')
-        links = soup.find_all('a')
+        links = content.links
         
         internal_links = []
         external_links = []
+        generic_links = 0
         
-        for link in links:
-            href = link.get('href', '')
+        # Classify each link and check its anchor text in the same pass
+        for href, anchor_text in links:
             if href.startswith('/') or href.startswith('http') and 'yourdomain.com' in href:
                 internal_links.append(href)
             elif href.startswith('http'):
                 external_links.append(href)
+            
+            if anchor_text.strip().lower() in self.GENERIC_ANCHORS:
+                generic_links += 1
         
         # Internal links check
-        if len(internal_links) < self.thresholds['internal_links']['min']:
+        if len(internal_links) < self.THRESHOLDS['internal_links']['min']:
             score -= 20
-            suggestions.append(f"Too few internal links ({len(internal_links)}). Aim for at least {self.thresholds['internal_links']['min']}.")
+            suggestions.append(f"Too few internal links ({len(internal_links)}). Aim for at least {self.THRESHOLDS['internal_links']['min']}.")
         
         # External links check
         if len(external_links) == 0:
             score -= 10
             suggestions.append("No external links found. Consider adding authoritative sources.")
-        elif len(external_links) > self.thresholds['external_links']['max']:
+        elif len(external_links) > self.THRESHOLDS['external_links']['max']:
             score -= 15
-            suggestions.append(f"Too many external links ({len(external_links)}). Keep under {self.thresholds['external_links']['max']}.")
+            suggestions.append(f"Too many external links ({len(external_links)}). Keep under {self.THRESHOLDS['external_links']['max']}.")
         
         # Link text analysis
-        link_texts = [link.get_text().strip() for link in links if link.get_text().strip()]
-        generic_links = sum(1 for text in link_texts if text.lower() in ['click here', 'read more', 'learn more'])
         if generic_links > 0:
             suggestions.append(f"Found {generic_links} generic link texts. Use descriptive anchor text.")
         
@@ -401,16 +681,15 @@ class SEOWorker:
             data={'internal_links': len(internal_links), 'external_links': len(external_links), 'total_links': len(links)}
         )
 
-    def analyze_schema_markup(self, content: str, post_data: Dict[str, Any]) -> SEOCheck:
+    def analyze_schema_markup(self, content: SEOContent, post_data: Dict[str, Any]) -> SEOCheck:
         """Analyze and suggest schema markup"""
         suggestions = []
         score = 100.0
         
         # Check for existing schema
-        soup = BeautifulSoup(content, 'html.parser')
-        existing_schema = soup.find('script', {'type': 'application/ld+json'})
+        existing_schema = content.schema
         
-        if not existing_schema:
+        if existing_schema is None:
             score -= 30
             suggestions.append("No schema markup found. Add structured data for better search visibility.")
             
@@ -419,11 +698,11 @@ class SEOWorker:
             suggestions.append(f"Suggested schema: {schema_suggestion}")
         else:
             try:
-                schema_data = json.loads(existing_schema.string)
+                schema_data = orjson.loads(existing_schema)
                 if '@type' not in schema_data:
                     score -= 15
                     suggestions.append("Schema markup missing @type property.")
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 score -= 20
                 suggestions.append("Invalid JSON in schema markup.")
         
@@ -438,51 +717,42 @@ class SEOWorker:
             data={'has_schema': existing_schema is not None}
         )
 
-    def _get_lsi_keywords(self, target_keyword: str) -> List[str]:
-        """Get LSI (Latent Semantic Indexing) keywords"""
-        # Simple LSI keywords - in production, use a more sophisticated approach
-        lsi_map = {
-            'ai blog writing': ['content creation', 'artificial intelligence', 'blogging', 'seo', 'marketing'],
-            'seo optimization': ['search engine', 'keywords', 'ranking', 'traffic', 'analytics'],
-            'content marketing': ['strategy', 'audience', 'engagement', 'conversion', 'brand'],
-            'digital marketing': ['online', 'social media', 'email', 'advertising', 'campaigns']
-        }
-        
-        return lsi_map.get(target_keyword.lower(), [])
+    def _get_lsi_keywords(self, keyword_lower: str) -> frozenset:
+        """Get LSI (Latent Semantic Indexing) keywords for a lowercased keyword"""
+        return self.LSI_MAP.get(keyword_lower, frozenset())
 
     def _generate_schema_suggestion(self, post_data: Dict[str, Any]) -> str:
         """Generate schema markup suggestion"""
-        schema = {
-            "@context": "https://schema.org",
-            "@type": "Article",
-            "headline": post_data.get('title', ''),
-            "author": {
-                "@type": "Person",
-                "name": "Author Name"  # Get from user data
-            },
-            "datePublished": post_data.get('created_at', ''),
-            "dateModified": post_data.get('updated_at', ''),
-            "publisher": {
-                "@type": "Organization",
-                "name": "Your Brand",
-                "logo": {
-                    "@type": "ImageObject",
-                    "url": "https://yourdomain.com/logo.png"
-                }
-            },
-            "description": post_data.get('meta_description', ''),
-            "mainEntityOfPage": {
-                "@type": "WebPage",
-                "@id": f"https://yourdomain.com/{post_data.get('slug', '')}"
-            }
-        }
-        
-        return json.dumps(schema, indent=2)
+        return self.SCHEMA_TEMPLATE.substitute(
+            headline=json.dumps(post_data.get('title', '')),
+            date_published=json.dumps(post_data.get('created_at', '')),
+            date_modified=json.dumps(post_data.get('updated_at', '')),
+            description=json.dumps(post_data.get('meta_description', '')),
+            page_id=json.dumps(f"https://yourdomain.com/{post_data.get('slug', '')}")
+        )
 
-    async def run_seo_analysis(self, post_id: str) -> SEOAnalysis:
-        """Run comprehensive SEO analysis"""
-        # Get post data
-        post_data = await self.get_post_data(post_id)
+    def _content_parser(self) -> etree.HTMLParser:
+        """Get this thread's content parser, creating it on first use"""
+        parser = getattr(self._parser_local, 'parser', None)
+        if parser is None:
+            parser = etree.HTMLParser(target=SEOContentTarget())
+            self._parser_local.parser = parser
+        return parser
+
+    def _parse_content(self, html: str) -> SEOContent:
+        """Stream draft HTML through the collecting parser target"""
+        parser = self._content_parser()
+        try:
+            parser.feed(html)
+            return parser.close()
+        except Exception:
+            # Don't reuse a parser whose target may hold a partial document
+            self._parser_local.parser = None
+            raise
+
+    async def _run_checks(self, post_data: Dict[str, Any]) -> List[SEOCheck]:
+        """Run every analyzer over a post"""
+        loop = asyncio.get_running_loop()
         
         # Run all checks
         checks = []
@@ -499,11 +769,89 @@ class SEOWorker:
         # Content analysis
         content = post_data.get('content', '')
         if content:
-            checks.append(self.analyze_heading_structure(content))
-            checks.append(self.analyze_readability(content))
-            checks.append(self.analyze_keyword_density(content, post_data.get('target_keyword', '')))
-            checks.append(self.analyze_links(content))
-            checks.append(self.analyze_schema_markup(content, post_data))
+            # Parse once, off the event loop with the executor thread's own
+            # parser, and share what was collected with every content check
+            parsed = await loop.run_in_executor(self._executor, self._parse_content, content)
+            text_content = parsed.text
+            text_lower = text_content.lower()
+            total_words = len(text_lower.split())
+            
+            # The content checks are independent, so run them side by side
+            checks.extend(await asyncio.gather(
+                loop.run_in_executor(self._executor, self.analyze_heading_structure, parsed),
+                loop.run_in_executor(self._executor, self.analyze_readability, text_content),
+                loop.run_in_executor(self._executor, self.analyze_keyword_density, text_lower, total_words, post_data.get('target_keyword', '')),
+                loop.run_in_executor(self._executor, self.analyze_links, parsed),
+                loop.run_in_executor(self._executor, self.analyze_schema_markup, parsed, post_data)
+            ))
+        
+        return checks
+
+    def _analysis_digest(self, post_data: Dict[str, Any]) -> str:
+        """Hash the post fields that the checks depend on"""
+        key = '\x00'.join([str(SEO_CACHE_VERSION)] + [str(post_data.get(field, '')) for field in SEO_CACHE_KEY_FIELDS])
+        return hashlib.blake2b(key.encode(), digest_size=20).hexdigest()
+
+    def _cache_path(self, digest: str) -> Path:
+        """Location of a cached analysis, sharded by digest prefix"""
+        return self._cache_dir / digest[:2] / digest
+
+    def _load_cached_checks(self, digest: str) -> Optional[List[SEOCheck]]:
+        """Load cached checks, or None on a miss or unreadable entry"""
+        path = self._cache_path(digest)
+        try:
+            checks = [SEOCheck.from_dict(item) for item in orjson.loads(path.read_bytes())]
+            # Bump the mtime so eviction drops the least recently used entries
+            os.utime(path)
+            return checks
+        except Exception:
+            return None
+
+    def _store_cached_checks(self, digest: str, checks: List[SEOCheck]):
+        """Write checks to the cache atomically, pruning it periodically"""
+        path = self._cache_path(digest)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(orjson.dumps([check.as_dict for check in checks]))
+            tmp_path.replace(path)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            return
+        
+        self._cache_writes += 1
+        if self._cache_writes % SEO_CACHE_PRUNE_INTERVAL == 0:
+            self._prune_cache()
+
+    def _prune_cache(self):
+        """Evict the least recently used entries beyond the size cap"""
+        entries = []
+        for path in self._cache_dir.glob('*/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        
+        excess = len(entries) - SEO_CACHE_MAX_ENTRIES
+        if excess > 0:
+            entries.sort()
+            for _, path in entries[:excess]:
+                path.unlink(missing_ok=True)
+
+    async def run_seo_analysis(self, post_id: str) -> SEOAnalysis:
+        """Run comprehensive SEO analysis"""
+        # Get post data
+        post_data = await self.get_post_data(post_id)
+        
+        # Reuse the checks from an earlier run if nothing analysed has changed
+        loop = asyncio.get_running_loop()
+        digest = self._analysis_digest(post_data)
+        checks = await loop.run_in_executor(self._executor, self._load_cached_checks, digest)
+        if checks is None:
+            checks = await self._run_checks(post_data)
+            await loop.run_in_executor(self._executor, self._store_cached_checks, digest, checks)
         
         # Calculate overall score
         overall_score = sum(check.score for check in checks) / len(checks) if checks else 0
@@ -522,70 +870,50 @@ class SEOWorker:
         
         return analysis
 
+    def _seo_analysis_row(self, analysis: SEOAnalysis) -> tuple:
+        """Build the qa_checks parameters for an analysis"""
+        return (
+            analysis.post_id,
+            'seo_analysis',
+            'pass' if analysis.overall_score >= 80 else 'warning' if analysis.overall_score >= 60 else 'fail',
+            analysis.overall_score,
+            f"SEO Score: {analysis.overall_score:.1f}/100",
+            orjson.dumps({
+                'overall_score': analysis.overall_score,
+                'checks': [check.as_dict for check in analysis.checks]
+            }).decode(),
+            analysis.created_at,
+            analysis.updated_at
+        )
+
     async def save_seo_analysis(self, analysis: SEOAnalysis):
         """Save SEO analysis to database"""
-        async with await self.get_db_connection() as conn:
-            async with conn.cursor() as cur:
-                # Save main analysis
-                await cur.execute("""
-                    INSERT INTO qa_checks (post_id, check_type, status, score, message, data, created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (post_id, check_type) 
-                    DO UPDATE SET 
-                        status = EXCLUDED.status,
-                        score = EXCLUDED.score,
-                        message = EXCLUDED.message,
-                        data = EXCLUDED.data,
-                        updated_at = EXCLUDED.updated_at
-                """, (
-                    analysis.post_id,
-                    'seo_analysis',
-                    'pass' if analysis.overall_score >= 80 else 'warning' if analysis.overall_score >= 60 else 'fail',
-                    analysis.overall_score,
-                    f"SEO Score: {analysis.overall_score:.1f}/100",
-                    json.dumps({
-                        'overall_score': analysis.overall_score,
-                        'checks': [
-                            {
-                                'type': check.check_type,
-                                'status': check.status,
-                                'score': check.score,
-                                'message': check.message,
-                                'suggestions': check.suggestions,
-                                'data': check.data
-                            }
-                            for check in analysis.checks
-                        ]
-                    }),
-                    analysis.created_at,
-                    analysis.updated_at
-                ))
-                
-                await conn.commit()
+        pool = await self.get_db_pool()
+        await pool.execute(SAVE_SEO_ANALYSIS_SQL, *self._seo_analysis_row(analysis))
+
+    async def save_seo_analyses(self, analyses: List[SEOAnalysis]):
+        """Save a batch of SEO analyses in one round trip"""
+        if not analyses:
+            return
+        
+        pool = await self.get_db_pool()
+        await pool.executemany(SAVE_SEO_ANALYSIS_SQL, [self._seo_analysis_row(analysis) for analysis in analyses])
 
     async def process_seo_request(self, post_id: str) -> Dict[str, Any]:
         """Main processing function"""
         try:
             analysis = await self.run_seo_analysis(post_id)
+            statuses = Counter(check.status for check in analysis.checks)
             
             return {
                 'success': True,
                 'post_id': post_id,
                 'overall_score': analysis.overall_score,
-                'checks': [
-                    {
-                        'type': check.check_type,
-                        'status': check.status,
-                        'score': check.score,
-                        'message': check.message,
-                        'suggestions': check.suggestions
-                    }
-                    for check in analysis.checks
-                ],
+                'checks': [check.as_dict for check in analysis.checks],
                 'summary': {
-                    'pass': len([c for c in analysis.checks if c.status == 'pass']),
-                    'warning': len([c for c in analysis.checks if c.status == 'warning']),
-                    'fail': len([c for c in analysis.checks if c.status == 'fail'])
+                    'pass': statuses['pass'],
+                    'warning': statuses['warning'],
+                    'fail': statuses['fail']
                 }
             }
         except Exception as e:
@@ -599,12 +927,15 @@ async def main():
     """Test the SEO worker"""
     worker = SEOWorker()
     
-    # Test with a sample post ID
-    post_id = "test-post-123"
-    result = await worker.process_seo_request(post_id)
-    
-    print("SEO Analysis Result:")
-    print(json.dumps(result, indent=2, default=str))
+    try:
+        # Test with a sample post ID
+        post_id = "test-post-123"
+        result = await worker.process_seo_request(post_id)
+        
+        print("SEO Analysis Result:")
+        print(json.dumps(result, indent=2, default=str))
+    finally:
+        await worker.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
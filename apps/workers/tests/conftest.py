@@ -0,0 +1,26 @@
+"""Shared fixtures for the worker tests"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+WORKERS_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_worker(name: str):
+    """Import <name>/main.py once, as module <name>_main"""
+    module_name = f"{name}_main"
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, WORKERS_DIR / name / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
+
+
+@pytest.fixture(scope="session")
+def load_worker():
+    """Import a worker's main module by its directory name"""
+    return import_worker
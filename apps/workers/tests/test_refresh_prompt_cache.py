@@ -0,0 +1,87 @@
+"""Refresh prompt reuse across posts whose traffic drops look alike"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+POST_A_RESPONSE = {
+    "title": "Refresh 'Email Marketing Basics' for 2024",
+    "description": "Email Marketing Basics lost half its readers; its examples are dated.",
+    "suggested_actions": ["Update statistics", "Add recent case studies", "Refresh the meta description"],
+    "priority": "high",
+}
+
+
+@pytest.fixture
+def refresh(load_worker):
+    return load_worker("refresh_worker")
+
+
+@pytest.fixture
+def worker(refresh, monkeypatch):
+    """A RefreshWorker with an empty in-memory prompt cache and OpenAI faked"""
+    worker = refresh.RefreshWorker()
+    worker._prompt_cache_loaded = True
+    worker.requests = []
+
+    async def request_refresh_prompt(messages):
+        worker.requests.append(messages)
+        return dict(POST_A_RESPONSE)
+
+    async def save_to_llm_cache(key, response):
+        pass
+
+    async def save_to_prompt_cache(embedding, response):
+        worker.add_to_prompt_cache(embedding, response)
+
+    monkeypatch.setattr(worker, "request_refresh_prompt", request_refresh_prompt)
+    monkeypatch.setattr(worker, "save_to_llm_cache", save_to_llm_cache)
+    monkeypatch.setattr(worker, "save_to_prompt_cache", save_to_prompt_cache)
+    return worker
+
+
+def make_drop(refresh, post_id, title):
+    """Traffic drop and analysis with the same profile for every post"""
+    traffic_drop = refresh.TrafficDrop(
+        post_id=post_id,
+        post_title=title,
+        current_traffic=400,
+        previous_traffic=1000,
+        drop_percentage=0.6,
+        days_since_published=120,
+        last_updated=NOW,
+        severity="high",
+    )
+    analysis = refresh.ContentAnalysis(
+        post_id=post_id,
+        content_freshness_score=0.4,
+        keyword_relevance_score=0.5,
+        competitor_gap_score=0.5,
+        seo_opportunity_score=0.5,
+        overall_refresh_score=0.45,
+        analysis_date=NOW,
+    )
+    return traffic_drop, analysis
+
+
+@pytest.mark.asyncio
+async def test_similar_drops_keep_their_own_titles(refresh, worker):
+    embedding = np.zeros(refresh.EMBEDDING_DIM, dtype=np.float32)
+    embedding[0] = 1.0
+
+    drop_a, analysis_a = make_drop(refresh, "post-a", "Email Marketing Basics")
+    drop_b, analysis_b = make_drop(refresh, "post-b", "Sourdough Starter Guide")
+    prompt_a = await worker.generate_refresh_prompt(drop_a, analysis_a, embedding, now=NOW)
+    prompt_b = await worker.generate_refresh_prompt(drop_b, analysis_b, embedding.copy(), now=NOW)
+
+    # Post B hit the similarity cache instead of asking OpenAI again
+    assert len(worker.requests) == 1
+    assert prompt_a.title == POST_A_RESPONSE["title"]
+    assert prompt_b.post_id == "post-b"
+    assert "Sourdough Starter Guide" in prompt_b.title
+    assert "Email Marketing" not in prompt_b.title
+    assert "Email Marketing" not in prompt_b.description
+    assert prompt_b.suggested_actions == POST_A_RESPONSE["suggested_actions"]
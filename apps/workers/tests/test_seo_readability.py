@@ -0,0 +1,55 @@
+"""The SEO worker's single-pass readability metrics must match textstat"""
+
+import random
+
+import pytest
+from textstat import textstat
+
+WORDS = (
+    "the a content marketing strategy search engine optimization readability "
+    "you we they it's don't we'll they're I'd o'clock rock'n'roll e-mail "
+    "well-known state-of-the-art 2024 3.5 100% AI SEO U.S. Mr. Dr. beautiful "
+    "extraordinary unbelievably simple table every queue rhythm syzygy"
+).split()
+PUNCTUATION = [".", ".", ".", "!", "?", ",", ";", ":", " -", "...", '"', "'"]
+
+
+def random_text(rng: random.Random) -> str:
+    """Prose-like text: sentences of varied length, punctuation and paragraph breaks"""
+    parts = []
+    for _ in range(rng.randint(1, 40)):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30)))
+        parts.append(sentence.capitalize() + rng.choice(PUNCTUATION))
+        if rng.random() < 0.15:
+            parts.append("\n\n")
+    return " ".join(parts)
+
+
+FIXED_TEXTS = [
+    "",
+    "Hello.",
+    "Hello world",
+    "Short one. Another short one. Ok.",
+    "The quick brown fox jumps over the lazy dog. It wasn't amused!",
+    "AI-powered blog writing tools help you create better content faster. "
+    "Discover tips, tricks and best practices for modern blogging workflows.",
+    "Mr. Smith went to Washington. He didn't stay long; the U.S. capital was busy.",
+    "Well... that's it? Yes! No. Maybe: it's 3.5 times 100% of 2024's total.",
+]
+rng = random.Random(20240101)
+TEXTS = FIXED_TEXTS + [random_text(rng) for _ in range(200)]
+
+
+@pytest.fixture(scope="module")
+def seo_worker(load_worker):
+    return load_worker("seo_worker").SEOWorker()
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_readability_metrics_match_textstat(seo_worker, text):
+    assert seo_worker._compute_readability_metrics(text) == (
+        textstat.flesch_reading_ease(text),
+        textstat.flesch_kincaid_grade(text),
+        textstat.sentence_count(text),
+        textstat.lexicon_count(text),
+    )
@@ -0,0 +1,111 @@
+"""Signed URL round trips through SecurityWorker, with Redis and Postgres faked"""
+
+from datetime import datetime
+
+import pytest
+
+
+class FakeRedis:
+    """Just the key/value calls the signed URL cache makes"""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, exat=None):
+        self.values[key] = int(value)
+
+    def decr_if_exists(self, keys):
+        """Stand-in for SIGNED_URL_DECR_SCRIPT"""
+        key = keys[0]
+        if key not in self.values:
+            return None
+        self.values[key] -= 1
+        return self.values[key]
+
+
+@pytest.fixture
+def worker(load_worker, monkeypatch):
+    """A SecurityWorker whose signed_urls table and Redis live in dicts"""
+    security = load_worker("security_worker")
+    worker = security.SecurityWorker()
+    redis_client = FakeRedis()
+    rows = {}
+
+    async def save_signed_url(signed_url):
+        rows[signed_url.id] = {
+            "access_count": 0,
+            "max_accesses": signed_url.max_accesses,
+            "expires_at": datetime.fromisoformat(signed_url.expires_at),
+        }
+
+    async def consume_signed_url(url_id):
+        row = rows.get(url_id)
+        if row is None or row["access_count"] >= row["max_accesses"] or row["expires_at"] <= datetime.now():
+            return None
+        row["access_count"] += 1
+        return {"remaining": row["max_accesses"] - row["access_count"], "expires_at": row["expires_at"]}
+
+    def write_signed_url_accesses(pending):
+        for url_id, n in pending.items():
+            rows[url_id]["access_count"] += n
+
+    monkeypatch.setattr(worker, "redis_client", redis_client)
+    monkeypatch.setattr(worker, "_decr_signed_url", redis_client.decr_if_exists)
+    monkeypatch.setattr(worker, "_save_signed_url", save_signed_url)
+    monkeypatch.setattr(worker, "_consume_signed_url", consume_signed_url)
+    monkeypatch.setattr(worker, "_write_signed_url_accesses", write_signed_url_accesses)
+    worker.rows = rows
+    worker.fake_redis = redis_client
+    return worker
+
+
+@pytest.mark.asyncio
+async def test_created_url_validates(worker):
+    # Regression: URLs were signed over the float expiry but validated
+    # against the integer one in the query string, so none ever validated
+    signed_url = await worker.create_signed_url("image", "img-1")
+
+    assert await worker.validate_signed_url(signed_url.url)
+    await worker.close()
+    assert worker.rows[signed_url.id]["access_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_url_is_used_up_after_max_accesses(worker):
+    signed_url = await worker.create_signed_url("image", "img-1", max_accesses=2)
+
+    assert await worker.validate_signed_url(signed_url.url)
+    assert await worker.validate_signed_url(signed_url.url)
+    assert not await worker.validate_signed_url(signed_url.url)
+    await worker.close()
+
+
+@pytest.mark.asyncio
+async def test_uncached_url_falls_back_to_database(worker):
+    signed_url = await worker.create_signed_url("export", "exp-1", max_accesses=2)
+    worker.fake_redis.values.clear()
+
+    assert await worker.validate_signed_url(signed_url.url)
+    assert worker.rows[signed_url.id]["access_count"] == 1
+    # The database result re-seeds the Redis counter
+    assert worker.fake_redis.values[f"surl:{signed_url.id}"] == 1
+
+
+@pytest.mark.asyncio
+async def test_tampered_signature_is_rejected(worker):
+    signed_url = await worker.create_signed_url("document", "doc-1", permissions=["read", "write"])
+    base, _, query = signed_url.url.partition("?signature=")
+    signature, _, rest = query.partition("&")
+    tampered = "A" if signature[0] != "A" else "B"
+
+    assert not await worker.validate_signed_url(f"{base}?signature={tampered}{signature[1:]}&{rest}")
+    assert not await worker.validate_signed_url(signed_url.url.replace("permissions=read,write", "permissions=read,write,delete"))
+    assert worker.rows[signed_url.id]["access_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_url_is_rejected(worker):
+    signed_url = await worker.create_signed_url("backup", "bak-1", expires_in_hours=-1)
+
+    assert not await worker.validate_signed_url(signed_url.url)
+    assert worker.rows[signed_url.id]["access_count"] == 0
@@ -3,10 +3,11 @@
 import asyncio
 import json
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
 from datetime import datetime
 import numpy as np
+from scipy import sparse
 from sklearn.cluster import KMeans, DBSCAN
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
@@ -91,7 +92,7 @@ class ClusterWorker:
             logger.error(f"Error fetching keywords: {e}")
             raise
     
-    def create_embeddings(self, keywords: List[str]) -> np.ndarray:
+    def create_embeddings(self, keywords: List[str]) -> sparse.csr_matrix:
         """Create TF-IDF embeddings for keywords"""
         try:
             # Use TF-IDF for keyword embeddings
@@ -102,17 +103,14 @@ class ClusterWorker:
                 min_df=1
             )
             
-            # Create embeddings
-            embeddings = vectorizer.fit_transform(keywords)
-            
-            # Convert to dense array for clustering
-            return embeddings.toarray()
+            # Create embeddings, kept sparse: KMeans works on CSR input directly
+            return vectorizer.fit_transform(keywords)
             
         except Exception as e:
             logger.error(f"Error creating embeddings: {e}")
             raise
     
-    def cluster_keywords(self, keywords: List[Dict[str, Any]], embeddings: np.ndarray) -> List[KeywordCluster]:
+    def cluster_keywords(self, keywords: List[Dict[str, Any]], embeddings: Union[np.ndarray, sparse.csr_matrix]) -> List[KeywordCluster]:
         """Cluster keywords using K-means and similarity"""
         try:
             # Determine optimal number of clusters
@@ -128,18 +126,19 @@ class ClusterWorker:
             
             # Try different k values and find optimal
             inertias = []
-            k_values = range(2, max_k + 1)
+            k_values = list(range(2, max_k + 1))
             
+            # A single k-means++ run per k is enough for the inertia curve
             for k in k_values:
-                kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
+                kmeans = KMeans(n_clusters=k, init='k-means++', random_state=42, n_init=1)
                 kmeans.fit(embeddings)
                 inertias.append(kmeans.inertia_)
             
             # Find elbow point (simplified)
             optimal_k = self._find_elbow_point(k_values, inertias)
             
-            # Perform final clustering
-            kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=10)
+            # Perform final clustering; a few k-means++ restarts are plenty on TF-IDF vectors
+            kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init=3)
             cluster_labels = kmeans.fit_predict(embeddings)
             
             # Create clusters
@@ -204,16 +204,31 @@ CREATE TABLE IF NOT EXISTS analytics (
     pageviews INTEGER DEFAULT 0,
     unique_pageviews INTEGER DEFAULT 0,
     sessions INTEGER DEFAULT 0,
-    bounce_rate DECIMAL(5,2),
+    bounce_rate REAL,
     avg_time_on_page INTEGER,
-    ctr DECIMAL(5,2),
+    ctr REAL,
     impressions INTEGER DEFAULT 0,
     clicks INTEGER DEFAULT 0,
-    position DECIMAL(5,2),
+    position REAL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Create refresh prompt cache table (OpenAI responses keyed by context embedding)
+CREATE TABLE IF NOT EXISTS refresh_prompt_cache (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    embedding vector(384) NOT NULL,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Create LLM response cache table (keyed by SHA-256 of model + prompt)
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key BYTEA PRIMARY KEY,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Create comments table
 CREATE TABLE IF NOT EXISTS comments (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -275,6 +290,7 @@ CREATE INDEX IF NOT EXISTS idx_publishes_post_id ON publishes(post_id);
 CREATE INDEX IF NOT EXISTS idx_publishes_status ON publishes(status);
 CREATE INDEX IF NOT EXISTS idx_analytics_post_id ON analytics(post_id);
 CREATE INDEX IF NOT EXISTS idx_analytics_date ON analytics(date);
+CREATE INDEX IF NOT EXISTS idx_refresh_prompt_cache_created_at ON refresh_prompt_cache(created_at);
 CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id);
 CREATE INDEX IF NOT EXISTS idx_versions_post_id ON versions(post_id);
 CREATE INDEX IF NOT EXISTS idx_audit_log_org_id ON audit_log(org_id);